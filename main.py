@@ -1,20 +1,62 @@
 import tkinter as tk
 from tkinter import messagebox
 import sudoku_penciling as sud
+import sudoku_pool
+import sudoku_async
+import sudoku_board
+import sudoku_hint
+import time
 from tkinter import Toplevel
-import copy
+
+# How often a running solve is checked on, in milliseconds.
+SOLVE_POLL_MS = 50
+# How often Generate looks for a puzzle again while the pool is being refilled.
+POOL_POLL_MS = 100
+# Search nodes the status check may spend on the Tk thread after an entry; a board it
+# cannot settle within them is checked by a background solve instead.
+STATUS_MAX_NODES = 1000
+CONFLICT_COLOR = "salmon"
+HINT_COLOR = "khaki"
+
+# Solve replays the search as an animation: one repaint of the changed cells per frame,
+# with the cell changes shown per frame doubling every second up to a cap, so easy
+# boards can be followed and hard ones still finish. Solve pressed again skips to the end.
+TRACE_FRAME_MS = 33
+TRACE_FRAMES_PER_DOUBLING = 30
+TRACE_MAX_STEPS = 1024
+TRACE_GUESS_COLOR = "gold"
+TRACE_TENTATIVE_COLOR = "lavender" # deduced from a guess that may still be undone
 
 class SudokuGUI:
     def __init__(self, root, width=500, height=500):
         self.root = root
         self.root.title("Sudoku Game")
         self.grid = []
+        self.cell_vars = [] # StringVar per entry, traced so typing and pasting both reach the model
+        self.writing_cells = False # True while the program itself changes entries
         self.sudoku_board = []
+        # Mirrors the entries as they are typed, for conflict highlighting and solvability checks.
+        self.board_model = sudoku_board.BoardModel()
         self.create_grid()
         self.fixed_cells = set()
         self.solvable = False
         self.difficulty = ""
-
+        self.solving = None # sudoku_async.BackgroundSolve while a submitted board is being solved
+        self.pool_after = None # pending take_puzzle call while Generate waits for the pool
+        self.status_after = None # pending show_board_status, once per burst of entry changes
+        self.checking = None # sudoku_async.BackgroundSolve settling solvability of the entries
+        self.check_after = None
+        self.hint_cells = set() # cells of the hint on show, until the next entry
+        self.trace = None # sud.trace_solve generator while Solve is animating
+        self.trace_after = None
+        self.trace_frames = 0
+        self.trace_guesses = set()
+
+        # Ready-made puzzles for Generate, refilled in the background and kept across runs.
+        self.puzzle_pool = sudoku_pool.PuzzlePool()
+        self.puzzle_pool.load()
+        self.puzzle_pool.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         self.center_window(width, height)
         self.root.resizable(False, False)
@@ -28,7 +70,7 @@ class SudokuGUI:
         self.check_button.grid(row=2, column=10, columnspan=2)
         self.check_button['state'] = "disable"
 
-        self.solve_button = tk.Button(self.root, text="Solve", width=10, height=2, command=self.solve)
+        self.solve_button = tk.Button(self.root, text="Solve", width=10, height=2, command=self.watch_solve)
         self.solve_button.grid(row=3, column=10, columnspan=2)
         self.solve_button['state'] = "disable"
 
@@ -39,6 +81,13 @@ class SudokuGUI:
         self.generate_button.grid(row=5, column=10, columnspan=2)
         #self.generate_button['state'] = "active"
 
+        self.status_label = tk.Label(self.root, text="", width=12)
+        self.status_label.grid(row=6, column=10, columnspan=2)
+
+        self.hint_button = tk.Button(self.root, text="Hint", width=10, height=2, command=self.show_hint)
+        self.hint_button.grid(row=7, column=10, columnspan=2)
+        self.hint_button['state'] = "disable"
+
         self.rule_button = tk.Button(self.root, text="Rules", width=10, height=2, command=self.show_rules)
         self.rule_button.grid(row=8, column=10, columnspan=2)
         self.root.resizable(False, False)
@@ -64,6 +113,7 @@ class SudokuGUI:
         # Create a 9x9 grid of textboxes with black lines for 3x3 blocks
         for row in range(9):
             grid_row = []
+            var_row = []
             for col in range(9):
                 # Create a frame to hold the entry widget and give it borders
                 frame = tk.Frame(self.root, bd=2, relief='solid')  # Black border frame
@@ -73,96 +123,315 @@ class SudokuGUI:
                 vcmd = (self.root.register(sud.limit_to_one_digit), '%P')
 
                 # Create an entry widget inside the frame
-                entry = tk.Entry(frame, width=2, justify='center', font=('Arial', 14), validate='key', validatecommand=vcmd)
+                cell_var = tk.StringVar()
+                cell_var.trace_add("write", lambda *args, row=row, col=col: self.cell_changed(row, col))
+                entry = tk.Entry(frame, width=2, justify='center', font=('Arial', 14), validate='key', validatecommand=vcmd,
+                                 textvariable=cell_var)
                 entry.pack(ipadx=5, ipady=5)  # Pack it into the frame
                 entry.bind("<Enter>", lambda event, widget=entry: widget.config(bg="lightblue"))
-                entry.bind("<Leave>", lambda event, widget=entry: widget.config(bg="white"))
+                entry.bind("<Leave>", lambda event, widget=entry, row=row, col=col: widget.config(bg=self.cell_color(row, col)))
                 entry.config(cursor="arrow")
                 grid_row.append(entry)
+                var_row.append(cell_var)
             self.grid.append(grid_row)
+            self.cell_vars.append(var_row)
+
+    def cell_color(self, row, col) -> str:
+        if (row, col) in self.board_model.conflicts:
+            return CONFLICT_COLOR
+        return HINT_COLOR if (row, col) in self.hint_cells else "white"
+
+    def cell_changed(self, row, col) -> None:
+        # Called whenever a cell's text changes: update the model and repaint only the cells whose conflict state changed
+        if self.writing_cells:
+            return
+        value = self.cell_vars[row][col].get()
+        value = int(value) if value else 0
+        if value == self.board_model.get(row, col):
+            return
+        old_conflicts = set(self.board_model.conflicts)
+        self.board_model.set(row, col, value)
+        old_hint_cells, self.hint_cells = self.hint_cells, set()
+        for r, c in (old_conflicts ^ self.board_model.conflicts) | old_hint_cells:
+            self.paint_cell(r, c)
+        # Replacing a digit writes the cell twice and a paste may write several; check once after them.
+        self.cancel_check()
+        if self.status_after is None:
+            self.status_after = self.root.after_idle(self.show_board_status)
+
+    def write_cell(self, row, col, value) -> None:
+        # Show value (0 for blank) in a cell without it counting as an entry, even if the cell is disabled
+        entry = self.grid[row][col]
+        state = entry.cget('state')
+        self.writing_cells = True
+        try:
+            entry.config(state='normal')
+            entry.delete(0, tk.END)
+            if value:
+                entry.insert(0, str(value))
+        finally:
+            entry.config(state=state)
+            self.writing_cells = False
+
+    def paint_cell(self, row, col) -> None:
+        if str(row) + str(col) in self.fixed_cells:
+            color = CONFLICT_COLOR if (row, col) in self.board_model.conflicts else 'lightblue'
+            self.grid[row][col].config(disabledbackground=color)
+        else:
+            self.grid[row][col].config(bg=self.cell_color(row, col))
+
+    def show_board_status(self) -> None:
+        # Once a board is in play, say when the entries can no longer lead to a solution
+        self.status_after = None
+        if self.solving is not None or self.trace is not None:
+            return
+        text = ""
+        if self.board_model.conflicts:
+            text = "Conflict"
+        elif self.solvable and not self.board_model.is_complete():
+            verdict = self.board_model.is_solvable(STATUS_MAX_NODES)
+            if verdict is None:
+                self.start_check()
+            elif verdict is False:
+                text = "Not solvable"
+        self.status_label.config(text=text)
+
+    def start_check(self) -> None:
+        # Settle in a separate process what the capped search in show_board_status could not
+        self.cancel_check()
+        self.checking = sudoku_async.BackgroundSolve(self.board_model.to_board(), "bits")
+        self.check_after = self.root.after(SOLVE_POLL_MS, self.poll_check)
+
+    def poll_check(self) -> None:
+        # Any entry cancels the check, so a result always describes the entries as they are
+        self.check_after = None
+        result = self.checking.poll()
+        if result is None:
+            self.check_after = self.root.after(SOLVE_POLL_MS, self.poll_check)
+            return
+        self.checking = None
+        is_solved, msg, solution = result
+        if is_solved:
+            self.board_model.remember_solution(solution)
+        elif msg in ("unsolvable", "invalid"):
+            self.board_model.remember_unsolvable()
+        else:
+            return
+        self.show_board_status()
+
+    def cancel_check(self) -> None:
+        if self.check_after is not None:
+            self.root.after_cancel(self.check_after)
+            self.check_after = None
+        if self.checking is not None:
+            self.checking.cancel()
+            self.checking = None
+
+    def show_hint(self) -> None:
+        # Point out the cheapest next step from the entries so far and highlight its cells
+        try:
+            hint = sudoku_hint.next_hint(self.board_model.to_board())
+        except sud.InvalidBoard:
+            messagebox.showinfo("Hint", "Some entries conflict, fix the highlighted cells first.")
+            return
+        old_hint_cells, self.hint_cells = self.hint_cells, set(hint.cells) if hint is not None else set()
+        for row, col in old_hint_cells | self.hint_cells:
+            self.paint_cell(row, col)
+        if hint is None:
+            text = "The board is full." if self.board_model.filled == 81 else "No logical step left, the next one is a guess."
+        else:
+            text = hint.describe()
+        messagebox.showinfo("Hint", text)
 
     def submit(self) -> None:
         # Handle the input submission, determine if the input board is solvable/unsolvable or invalid
-        #self.sudoku_board = []
         for row in range(9):
-            current_row = []
             for col in range(9):
-                value = self.grid[row][col].get()  # Get the value from the tk.Entry widget
-                if value == '' or value == '0':
-                    value = '0'  # Treat empty cells as 0
-                else:
+                if self.board_model.get(row, col) != 0:
                     self.fixed_cells.add(str(row) + str(col))
                     self.grid[row][col].config(state='disabled', disabledbackground='lightblue', disabledforeground="black")
-                current_row.append(int(value))  # Convert the value to an integer
-            self.sudoku_board.append(current_row)
+                    self.paint_cell(row, col)
+        self.sudoku_board = self.board_model.to_board()
 
         # Print or process the submitted Sudoku board
         print("Submitted Sudoku Board:")
         sud.print_sudoku(self.sudoku_board)
-        self.solvable, msg = sud.solve_sudoku(self.sudoku_board)
-        
+
         self.submit_button['state'] = 'disable'
         self.generate_button['state'] = 'disable'
-        
+
+        # Conflicting clues are known to be invalid without solving anything.
+        if self.board_model.conflicts:
+            self.finish_solve((False, "invalid", None))
+            return
+
+        # Solve in a separate process so the window stays responsive; Reset cancels it.
+        self.solving = sudoku_async.BackgroundSolve(self.sudoku_board)
+        self.status_label.config(text="Solving...")
+        self.root.after(SOLVE_POLL_MS, self.poll_solve)
+
+    def poll_solve(self) -> None:
+        # Called from the Tk event loop until the background solve has finished
+        if self.solving is None:
+            return # cancelled by reset
+        result = self.solving.poll()
+        if result is None:
+            self.status_label.config(text="Solving... {:.0f}s".format(self.solving.elapsed()))
+            self.root.after(SOLVE_POLL_MS, self.poll_solve)
+            return
+        self.solving = None
+        self.status_label.config(text="")
+        self.finish_solve(result)
+
+    def finish_solve(self, result) -> None:
+        self.solvable, msg, solution = result
+        if self.solvable:
+            self.sudoku_board = solution
+            self.board_model.remember_solution(solution)
+        elif msg == "invalid":
+            print("Invalid board\n")
+        elif msg == "unsolvable":
+            print("Unsolvable sudoku\n")
+
         if self.solvable:
             messagebox.showinfo("Board Submitted", "Board has been submitted!")
             self.solve_button['state'] = 'active'
             self.check_button['state'] = 'active'
+            self.hint_button['state'] = 'active'
         else:
             messagebox.showinfo("Board Not Submitted", "Input board is {}".format(msg))
             self.solve_button['state'] = 'disable'
             self.check_button['state'] = 'disable'
+            self.hint_button['state'] = 'disable'
 
     def check_board(self) -> None:
-        # Verify the user's solution based on the original input board
-        user_board = []
-        for row in range(9):
-            current_row = []
-            for col in range(9):
-                value = self.grid[row][col].get()  # Get the value from the tk.Entry widget
-                if value == '' or value == '0':
-                    value = '0'
-                current_row.append(int(value))
-            user_board.append(current_row)
-        
-        if sud.verify_sudoku(user_board):
+        # Verify the user's solution based on the original input board; the model already knows
+        if self.board_model.is_complete():
             messagebox.showinfo("Congratulation", "Your solution to this board is correct!")
             self.check_button['state'] = 'disable'
+            self.hint_button['state'] = 'disable'
             self.solve_button['state'] = 'disable'
         else:
             messagebox.showinfo("Unfortunately", "Your solution to this board is incorrect or incomplete.")
 
+    def watch_solve(self) -> None:
+        # Animate the solver on the clues; pressed again while animating, show the solution at once
+        if self.trace is not None:
+            self.stop_trace()
+            self.solve()
+            return
+        self.cancel_check()
+        puzzle = [[self.board_model.get(row, col) if str(row) + str(col) in self.fixed_cells else 0
+                   for col in range(9)] for row in range(9)]
+        for row in range(9):
+            for col in range(9):
+                if str(row) + str(col) not in self.fixed_cells:
+                    self.show_trace_cell(row, col, 0, 'white')
+        self.trace = sud.trace_solve(puzzle)
+        self.trace_frames = 0
+        self.trace_guesses = set()
+        self.hint_cells = set()
+        self.solve_button.config(text="Skip")
+        self.check_button['state'] = 'disable'
+        self.hint_button['state'] = 'disable'
+        self.status_label.config(text="Solving...")
+        self.trace_after = self.root.after(TRACE_FRAME_MS, self.play_trace)
+
+    def play_trace(self) -> None:
+        # One frame: take trace events until enough cells changed or half the frame is used,
+        # then repaint each changed cell once with its latest value
+        self.trace_after = None
+        steps   = min(TRACE_MAX_STEPS, 2 ** (self.trace_frames // TRACE_FRAMES_PER_DOUBLING))
+        stop_at = time.perf_counter() + TRACE_FRAME_MS / 2000
+        changed = {}
+        self.trace_frames += 1
+        try:
+            while steps > 0 and time.perf_counter() < stop_at:
+                event = next(self.trace)
+                cell  = (event.row, event.col)
+                if event.kind == "eliminate":
+                    continue # candidates are not on show
+                steps -= 1
+                if event.kind == "guess":
+                    self.trace_guesses.add(cell)
+                    changed[cell] = (event.value, TRACE_GUESS_COLOR)
+                elif event.kind == "finalize":
+                    if cell in self.trace_guesses:
+                        color = TRACE_GUESS_COLOR
+                    else:
+                        color = TRACE_TENTATIVE_COLOR if event.depth else 'white'
+                    changed[cell] = (event.value, color)
+                else:
+                    for undone_cell in event.undone:
+                        self.trace_guesses.discard(undone_cell)
+                        changed[undone_cell] = (0, 'white')
+        except StopIteration:
+            self.stop_trace()
+            self.solve()
+            return
+        for (row, col), (value, color) in changed.items():
+            self.show_trace_cell(row, col, value, color)
+        self.trace_after = self.root.after(TRACE_FRAME_MS, self.play_trace)
+
+    def show_trace_cell(self, row, col, value, color) -> None:
+        self.write_cell(row, col, value)
+        self.grid[row][col].config(state='disabled', disabledbackground=color, disabledforeground="black")
+
+    def stop_trace(self) -> None:
+        if self.trace_after is not None:
+            self.root.after_cancel(self.trace_after)
+            self.trace_after = None
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+            self.solve_button.config(text="Solve")
+
     def solve(self) -> None:
         # This function is only called when the board is determined solvable
         # The function will display the result on the GUI
         for row in range(9):
             for col in range(9):
-                self.grid[row][col].delete(0, tk.END)
-                self.grid[row][col].insert(0, str(self.sudoku_board[row][col]))
+                self.write_cell(row, col, self.sudoku_board[row][col])
                 if str(row) + str(col) in self.fixed_cells:
                     self.grid[row][col].config(state='disabled', disabledbackground='lightblue', disabledforeground="black")
                 else:
                     self.grid[row][col].config(state='disabled', disabledbackground='white', disabledforeground="black")
 
+        self.board_model.load(self.sudoku_board)
+        self.status_label.config(text="")
         self.solve_button['state'] = 'disable'
         self.check_button['state'] = 'disable'
+        self.hint_button['state'] = 'disable'
 
     def reset(self) -> None:
         # This function will reset the whole board, change all buttons' state to their original state
+        self.cancel_solve()
+        self.stop_waiting_for_puzzle()
         for row in range(9):
             for col in range(9):
                 self.grid[row][col].config(state='normal')
-                self.grid[row][col].delete(0, tk.END)
+                self.write_cell(row, col, 0)
                 self.grid[row][col].config(bg='white')
 
         self.sudoku_board = []
+        self.board_model.clear()
+        self.hint_cells = set()
         self.fixed_cells = set()
         self.solvable = False
         self.solve_button['state'] = 'disable'
         self.submit_button['state'] = 'active'
         self.check_button['state'] = 'disable'
+        self.hint_button['state'] = 'disable'
         self.generate_button['state'] = 'active'
 
+    def cancel_solve(self) -> None:
+        self.stop_trace()
+        self.cancel_check()
+        if self.solving is not None:
+            self.solving.cancel()
+            self.solving = None
+        self.status_label.config(text="")
+
     def generate(self):
         message_box = Toplevel(root)
         message_box.title("Difficulty")
@@ -197,27 +466,54 @@ class SudokuGUI:
         def close_message_box(mode):
             self.difficulty = mode
             message_box.destroy()
-            temp = []
             #print(f"Difficulty {mode} was selected")
-            while not self.solvable:
-                temp = sud.spawn(self.difficulty)
-                sud.print_sudoku(temp)
-                self.sudoku_board = copy.deepcopy(temp)
-                self.solvable, msg = sud.solve_sudoku(temp)
-
-            for row in range(9):
-                for col in range(9):
-                    if self.sudoku_board[row][col] != 0:
-                        self.fixed_cells.add(str(row) + str(col))
-                        self.grid[row][col].delete(0, tk.END)
-                        self.grid[row][col].insert(0, str(self.sudoku_board[row][col]))
-                        self.grid[row][col].config(state='disabled', disabledbackground='lightblue', disabledforeground="black")
-
-            self.sudoku_board = temp
             self.generate_button['state'] = 'disable'
             self.submit_button['state'] = 'disable'
-            self.solve_button['state'] = 'active'
-            self.check_button['state'] = 'active'
+            self.take_puzzle()
+
+    def take_puzzle(self) -> None:
+        # Called from the Tk event loop until the pool has a puzzle; the refill thread works on it meanwhile
+        self.pool_after = None
+        entry = self.puzzle_pool.pop(self.difficulty)
+        if entry is None:
+            self.status_label.config(text="Generating...")
+            self.pool_after = self.root.after(POOL_POLL_MS, self.take_puzzle)
+            return
+        self.status_label.config(text="")
+        # Pooled puzzles always have exactly one solution, so no retries are needed.
+        puzzle, solution = entry
+        sud.print_sudoku(puzzle)
+        self.solvable = True
+
+        for row in range(9):
+            for col in range(9):
+                if puzzle[row][col] != 0:
+                    self.fixed_cells.add(str(row) + str(col))
+                    self.write_cell(row, col, puzzle[row][col])
+                    self.grid[row][col].config(state='disabled', disabledbackground='lightblue', disabledforeground="black")
+
+        self.sudoku_board = solution
+        self.board_model.load(puzzle)
+        self.board_model.remember_solution(solution)
+        self.solve_button['state'] = 'active'
+        self.check_button['state'] = 'active'
+        self.hint_button['state'] = 'active'
+
+    def stop_waiting_for_puzzle(self) -> None:
+        if self.pool_after is not None:
+            self.root.after_cancel(self.pool_after)
+            self.pool_after = None
+
+    def close(self) -> None:
+        # Keep the puzzles generated so far for the next start.
+        self.cancel_solve()
+        self.stop_waiting_for_puzzle()
+        self.puzzle_pool.stop()
+        try:
+            self.puzzle_pool.save()
+        except OSError:
+            pass
+        self.root.destroy()
 
     def show_rules(self) -> None:
         rule1 = "Rule 1: Each row must contain the numbers from 1 to 9, without repetitions"
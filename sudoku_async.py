@@ -0,0 +1,66 @@
+import multiprocessing
+import time
+from typing import List, Optional, Tuple
+import sudoku_penciling as sud
+
+# Solving off the caller's thread.
+# A hard or hostile board can keep the solver busy for a long time, which would freeze
+# a Tk event loop. BackgroundSolve runs the solver in a child process instead: the
+# caller polls it (e.g. from root.after) and can cancel it at any time by terminating
+# the process, which needs no cooperation from the solver. The child is spawned, not
+# forked: the GUI runs the puzzle pool's refill thread, and forking a process with
+# threads running can leave the child stuck on a lock one of them held.
+
+def solve_to_pipe(puzzle: bytes, engine: str, techniques: Tuple[str, ...], conn) -> None:
+    # Child process side: solve and send (is_solved, msg, packed board) back.
+    conn.send(sud.solve_packed_puzzle(puzzle, engine, techniques))
+    conn.close()
+
+class BackgroundSolve:
+    def __init__(self, board: List[List[int]], engine: str = "sets", techniques: Tuple[str, ...] = ()):
+        sud.check_solver_options(engine, techniques)
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe(duplex=False)
+        self._process = context.Process(target=solve_to_pipe, daemon=True,
+                                        args=(sud.board_to_bytes(board), engine, tuple(techniques), child_conn))
+        self._started = time.monotonic()
+        self._result  = None
+        self._process.start()
+        child_conn.close()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def poll(self) -> Optional[Tuple[bool, str, Optional[List[List[int]]]]]:
+        '''
+        Non-blocking. Returns None while the solve is running, then (is_solved, msg,
+        solution) with is_solved and msg as for solve_sudoku and solution the solved
+        board or None. msg is "cancelled" after cancel() and "error" if the child died.
+        '''
+        if self._result is not None:
+            return self._result
+        if self._conn.poll():
+            try:
+                is_solved, msg, board = self._conn.recv()
+                self._result = (is_solved, msg, sud.bytes_to_board(board) if is_solved else None)
+            except EOFError:
+                self._result = (False, "error", None)
+        elif not self._process.is_alive():
+            # The child may have sent its result just before exiting.
+            if self._conn.poll():
+                return self.poll()
+            self._result = (False, "error", None)
+        else:
+            return None
+        self._finish()
+        return self._result
+
+    def cancel(self) -> None:
+        if self._result is None:
+            self._process.terminate()
+            self._result = (False, "cancelled", None)
+            self._finish()
+
+    def _finish(self) -> None:
+        self._process.join(1)
+        self._conn.close()
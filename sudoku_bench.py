@@ -0,0 +1,213 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+import sudoku_penciling as sud
+import sudoku_grid
+import sudoku_io
+
+# Benchmark harness.
+# Times every engine on the corpora bundled in benchmarks/, one puzzle per line:
+#   easy        graded EASY puzzles from generate_puzzle
+#   seventeen   minimal 17-clue puzzles
+#   hardest     well-known hard puzzles (Inkala's, AI Escargot, Easter Monster, ...)
+#   unsolvable  boards without conflicting clues but without a solution either
+#   invalid     boards with conflicting clues
+# Each puzzle gets its own deadline, so a degenerate board shows up as a timeout
+# instead of stalling the run. Results can be written to a JSON file and a later run
+# compared against it to catch regressions.
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+CORPORA    = ("easy", "seventeen", "hardest", "unsolvable", "invalid")
+
+# Engine name -> fn(board, budget) -> (is_solved, msg), see solve_board_budgeted.
+BENCH_ENGINES: Dict[str, Callable] = {
+    "sets":       lambda board, budget: sud.solve_board_budgeted(board, "sets", (), budget),
+    "techniques": lambda board, budget: sud.solve_board_budgeted(board, "sets", sud.ALL_TECHNIQUES, budget),
+    "bits":       lambda board, budget: sud.solve_board_budgeted(board, "bits", (), budget),
+    "dlx":        lambda board, budget: sud.solve_board_budgeted(board, "dlx", (), budget),
+    "grid":       sudoku_grid.solve_grid_budgeted,
+}
+# Engines where every search node after the first is a guess. A DLX node is a chosen
+# matrix row, forced or not, so it has no guess count.
+GUESSING_ENGINES = ("sets", "techniques", "bits", "grid")
+STATUSES = { "": "solved", "invalid": "invalid", "unsolvable": "unsolvable", "timeout": "timeout" }
+
+def load_corpus(name: str) -> List[bytes]:
+    # Packed puzzles of a bundled corpus, or of the puzzle file (text or sudoku_io packed) at path name.
+    path = name if os.path.exists(name) else os.path.join(CORPUS_DIR, name + ".txt")
+    if sudoku_io.is_packed_file(path):
+        with sudoku_io.PackedPuzzleFile(path) as packed_file:
+            return list(packed_file)
+    with open(path, "rb") as f:
+        return list(sud.read_puzzle_lines(f))
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # Nearest-rank percentile of an ascending list.
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(math.ceil(fraction * len(sorted_values)) - 1, 0))]
+
+def solve_one(engine: str, puzzle: bytes, timeout: float) -> Tuple[str, float, int]:
+    # Returns (status, seconds, search nodes) for one packed puzzle.
+    try:
+        board = sud.bytes_to_board(puzzle)
+    except ValueError:
+        return "invalid", 0.0, 0
+    budget = sud.SolveBudget(deadline=time.monotonic() + timeout)
+    start  = time.perf_counter()
+    is_solved, msg = BENCH_ENGINES[engine](board, budget)
+    elapsed = time.perf_counter() - start
+    if is_solved and not sud.verify_sudoku(board):
+        raise Exception("{} returned a wrong solution for {}".format(engine, puzzle.decode()))
+    return STATUSES[msg], elapsed, budget.nodes
+
+def measure_peak_memory(engine: str, puzzles: List[bytes], timeout: float) -> int:
+    # Largest memory allocated while solving any one puzzle, in bytes.
+    peak = 0
+    tracemalloc.start()
+    try:
+        for puzzle in puzzles:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            solve_one(engine, puzzle, timeout)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def bench_corpus(engine: str, puzzles: List[bytes], timeout: float = 2.0, repeat: int = 1,
+                 memory: bool = True) -> Dict[str, object]:
+    '''
+    Benchmark one engine on one corpus. Every puzzle is solved repeat times and its
+    best time kept. Peak memory is measured in a separate pass under tracemalloc,
+    which would otherwise slow down the timed one.
+    '''
+    statuses  = { status: 0 for status in STATUSES.values() }
+    latencies = []
+    nodes     = []
+    for puzzle in puzzles:
+        runs = [solve_one(engine, puzzle, timeout) for _ in range(max(repeat, 1))]
+        status, elapsed, num_nodes = min(runs, key=lambda run: run[1])
+        statuses[status] += 1
+        latencies.append(elapsed)
+        nodes.append(num_nodes)
+
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        "puzzles":         len(puzzles),
+        "statuses":        statuses,
+        "puzzles_per_sec": len(puzzles) / total if total > 0 else 0.0,
+        "p50_ms":          1000 * percentile(latencies, 0.50),
+        "p99_ms":          1000 * percentile(latencies, 0.99),
+        "max_ms":          1000 * (latencies[-1] if latencies else 0.0),
+        "nodes_mean":      sum(nodes) / len(nodes) if nodes else 0.0,
+        "nodes_max":       max(nodes, default=0),
+        "guesses_mean":    None,
+        "peak_memory_kb":  None,
+    }
+    if engine in GUESSING_ENGINES and nodes:
+        result["guesses_mean"] = sum(max(num_nodes - 1, 0) for num_nodes in nodes) / len(nodes)
+    if memory:
+        result["peak_memory_kb"] = measure_peak_memory(engine, puzzles, timeout) / 1024
+    return result
+
+def run_benchmarks(corpora=CORPORA, engines=("sets", "bits", "dlx"), timeout: float = 2.0, repeat: int = 1,
+                   memory: bool = True, sizes=()) -> Dict[str, object]:
+    # Results for every corpus and engine, plus sudoku_grid.benchmark_sizes for the box sizes in sizes.
+    for engine in engines:
+        if engine not in BENCH_ENGINES:
+            raise ValueError("Unknown engine {}, expected one of {}".format(engine, tuple(BENCH_ENGINES)))
+    results = {
+        "meta": {
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "timeout":  timeout,
+            "repeat":   repeat,
+        },
+        "corpora": {},
+    }
+    for corpus in corpora:
+        puzzles = load_corpus(corpus)
+        results["corpora"][corpus] = { engine: bench_corpus(engine, puzzles, timeout, repeat, memory) for engine in engines }
+    if sizes:
+        results["grid_sizes"] = { str(side): rates for side, rates in sudoku_grid.benchmark_sizes(sizes).items() }
+    return results
+
+def compare_results(current: Dict[str, object], baseline: Dict[str, object], tolerance: float = 0.25) -> List[str]:
+    '''
+    Regressions of current against baseline, as readable lines: changed status counts,
+    throughput down or p99 latency or mean node count up by more than tolerance.
+    Corpora and engines missing from either run are skipped.
+    '''
+    regressions = []
+    for corpus, engines in current.get("corpora", {}).items():
+        for engine, result in engines.items():
+            old = baseline.get("corpora", {}).get(corpus, {}).get(engine)
+            if old is None:
+                continue
+            name = "{}/{}".format(corpus, engine)
+            if result["statuses"] != old["statuses"]:
+                regressions.append("{}: statuses changed from {} to {}".format(name, old["statuses"], result["statuses"]))
+            if result["puzzles_per_sec"] < (1 - tolerance) * old["puzzles_per_sec"]:
+                regressions.append("{}: {:.1f} puzzles/sec, was {:.1f}".format(name, result["puzzles_per_sec"], old["puzzles_per_sec"]))
+            if result["p99_ms"] > (1 + tolerance) * old["p99_ms"]:
+                regressions.append("{}: p99 {:.2f} ms, was {:.2f} ms".format(name, result["p99_ms"], old["p99_ms"]))
+            if result["nodes_mean"] > (1 + tolerance) * old["nodes_mean"]:
+                regressions.append("{}: {:.1f} nodes per puzzle, was {:.1f}".format(name, result["nodes_mean"], old["nodes_mean"]))
+    return regressions
+
+def print_results(results: Dict[str, object], out=sys.stdout) -> None:
+    header = "{:<11} {:<10} {:>10} {:>9} {:>9} {:>9} {:>9} {:>10}  {}".format(
+        "corpus", "engine", "puzzles/s", "p50 ms", "p99 ms", "nodes", "guesses", "peak KiB", "statuses")
+    print(header, file=out)
+    for corpus, engines in results["corpora"].items():
+        for engine, result in engines.items():
+            statuses = " ".join("{}={}".format(status, count) for status, count in result["statuses"].items() if count)
+            print("{:<11} {:<10} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.1f} {:>9} {:>10}  {}".format(
+                corpus, engine, result["puzzles_per_sec"], result["p50_ms"], result["p99_ms"], result["nodes_mean"],
+                "-" if result["guesses_mean"] is None else "{:.1f}".format(result["guesses_mean"]),
+                "-" if result["peak_memory_kb"] is None else "{:.0f}".format(result["peak_memory_kb"]),
+                statuses), file=out)
+    for side, rates in results.get("grid_sizes", {}).items():
+        print("{}x{}: generate {:.2f}/s, solve {:.2f}/s".format(side, side, rates["generate_per_sec"], rates["solve_per_sec"]), file=out)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sudoku solvers on the bundled corpora.")
+    parser.add_argument("--corpora", default=",".join(CORPORA),
+                        help="comma separated corpus names from benchmarks/ or puzzle file paths")
+    parser.add_argument("--engines", default="sets,bits,dlx",
+                        help="comma separated, from {}".format(", ".join(BENCH_ENGINES)))
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds allowed per puzzle")
+    parser.add_argument("--repeat", type=int, default=1, help="solve every puzzle this many times and keep the best")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory pass")
+    parser.add_argument("--sizes", default="", help="comma separated box sizes to benchmark with sudoku_grid, e.g. 2,3,4")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change allowed before it is a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.corpora.split(","), args.engines.split(","), args.timeout, args.repeat,
+                             not args.no_memory, tuple(int(size) for size in args.sizes.split(",") if size))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+from typing import List, Optional, Set, Tuple
+import sudoku_penciling as sud
+
+# Incremental board model for live play.
+# BoardModel keeps, for every row, column and box, how often each value occurs in
+# it, so entering or clearing a value only touches the cell's 3 units and 20 peers:
+#   - a unit's occupancy mask has bit v-1 set while v occurs in it, and a blank
+#     cell's candidates are ALL_CANDIDATES minus its 3 units' masks;
+#   - conflicts holds every cell whose value occurs twice in one of its units;
+#   - dead_cells holds every blank cell that has no candidate left.
+# is_solvable() remembers the last solution it found and keeps a count of filled
+# cells that disagree with it, so as long as the player follows a solution no
+# search runs at all. A board found unsolvable stays so while values are only
+# added, so that verdict is kept until a filled cell is cleared or changed.
+
+class BoardModel:
+    def __init__(self, board: Optional[List[List[int]]] = None):
+        self.clear()
+        if board is not None:
+            self.load(board)
+
+    def clear(self) -> None:
+        self.values      = [0] * 81
+        self.unit_counts = [[0] * 10 for _ in range(27)] # unit -> value -> occurrences
+        self.unit_masks  = [0] * 27
+        self.filled      = 0
+        self.conflicts: Set[Tuple[int, int]]  = set()
+        self.dead_cells: Set[Tuple[int, int]] = set()
+        self._solution   = None # flat solution agreeing with the filled cells when it was found
+        self._mismatches = 0    # filled cells that differ from _solution
+        self._unsolvable = False # the filled cells were found to have no solution
+
+    def load(self, board: List[List[int]]) -> None:
+        self.clear()
+        for row, col in sud.CELL_COORDS:
+            self.set(row, col, board[row][col])
+
+    def to_board(self) -> List[List[int]]:
+        return [self.values[row * 9: row * 9 + 9] for row in range(9)]
+
+    def get(self, row: int, col: int) -> int:
+        return self.values[row * 9 + col]
+
+    def candidates(self, row: int, col: int) -> int:
+        # Candidate mask of a cell (bit v-1 for value v); a filled cell has just its own value.
+        idx = row * 9 + col
+        if self.values[idx]:
+            return sud.value_to_bit(self.values[idx])
+        row_unit, col_unit, box_unit = sud.CELL_UNITS[idx]
+        return sud.ALL_CANDIDATES & ~(self.unit_masks[row_unit] | self.unit_masks[col_unit] | self.unit_masks[box_unit])
+
+    def candidate_values(self, row: int, col: int) -> List[int]:
+        mask = self.candidates(row, col)
+        return [value for value in range(1, 10) if mask & sud.value_to_bit(value)]
+
+    def set(self, row: int, col: int, value: int) -> None:
+        # Enter value (0 clears the cell), updating everything that depends on it.
+        if not 0 <= value <= 9:
+            raise ValueError("Values must be between 0 and 9, got {}".format(value))
+        idx = row * 9 + col
+        old = self.values[idx]
+        if old == value:
+            return
+        for unit in sud.CELL_UNITS[idx]:
+            counts = self.unit_counts[unit]
+            if old:
+                counts[old] -= 1
+                if counts[old] == 0:
+                    self.unit_masks[unit] &= ~sud.value_to_bit(old)
+            if value:
+                counts[value] += 1
+                self.unit_masks[unit] |= sud.value_to_bit(value)
+        self.values[idx] = value
+        self.filled += (value != 0) - (old != 0)
+        if old:
+            self._unsolvable = False
+
+        if self._solution is not None:
+            self._mismatches += ((value != 0 and value != self._solution[idx]) -
+                                 (old != 0 and old != self._solution[idx]))
+
+        # Only this cell and peers holding the old or new value can change conflict state,
+        # and only this cell and its peers can change candidates.
+        self.update_cell(idx)
+        for peer in sud.PEERS[idx]:
+            self.update_cell(peer)
+
+    def update_cell(self, idx: int) -> None:
+        cell  = sud.CELL_COORDS[idx]
+        value = self.values[idx]
+        if value and any(self.unit_counts[unit][value] > 1 for unit in sud.CELL_UNITS[idx]):
+            self.conflicts.add(cell)
+        else:
+            self.conflicts.discard(cell)
+        if value == 0 and self.candidates(*cell) == 0:
+            self.dead_cells.add(cell)
+        else:
+            self.dead_cells.discard(cell)
+
+    def is_complete(self) -> bool:
+        # Every cell filled without conflicts, i.e. verify_sudoku would accept the board.
+        return self.filled == 81 and not self.conflicts
+
+    def remember_solution(self, solution: List[List[int]]) -> None:
+        # Seed is_solvable with a known solution of the current clues, e.g. a generated puzzle's.
+        self._solution   = [solution[row][col] for row, col in sud.CELL_COORDS]
+        self._mismatches = sum(1 for idx, value in enumerate(self.values) if value and value != self._solution[idx])
+        self._unsolvable = False
+
+    def remember_unsolvable(self) -> None:
+        # Record that the current filled cells have no solution, e.g. as found by a background solve.
+        self._unsolvable = True
+
+    def is_solvable(self, max_nodes: Optional[int] = 20000) -> Optional[bool]:
+        '''
+        Whether the filled cells can still be completed to a solution. Conflicts, dead
+        cells, agreement with the remembered solution and a remembered unsolvable verdict
+        are answered in O(1); otherwise the bits engine searches from the current
+        candidates, giving up (and returning None) after max_nodes search nodes.
+        '''
+        if self.conflicts or self.dead_cells or self._unsolvable:
+            return False
+        if self._solution is not None and self._mismatches == 0:
+            return True
+        cells = [sud.value_to_bit(value) | sud.FINALIZED_BIT if value else self.candidates(row, col)
+                 for value, (row, col) in zip(self.values, sud.CELL_COORDS)]
+        try:
+            solved_state = sud.solve_bits(sud.BitSolveState(cells), sud.make_budget(max_nodes))
+        except sud.SolveTimeout:
+            return None
+        if solved_state is None:
+            self._unsolvable = True
+            return False
+        self._solution   = [sud.LOWEST_VALUE[cur_mask & sud.ALL_CANDIDATES] for cur_mask in solved_state.cells]
+        self._mismatches = 0
+        return True
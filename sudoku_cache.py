@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import groupby, permutations, product
+from typing import List, Optional, Tuple
+import math
+import sudoku_penciling as sud
+
+# Solution cache keyed on a canonical form of the puzzle.
+# Relabeling digits, permuting rows inside a band, columns inside a stack, bands,
+# stacks, and transposing all map a sudoku to an equivalent one, whose solution is the
+# same transform of the original solution. canonicalize() picks one representative
+# per class: the smallest board, digits numbered in order of first appearance, over a
+# set of row and column orders that is the same for every member of the class. Rows
+# and columns are ranked by invariants (clue layout and digit counts, refined against
+# each other a few rounds), sorted by rank, and every order of lines that tie is
+# tried. Boards that tie everywhere (e.g. near-empty ones) would need too many tries;
+# they get no key and are simply solved, which is cheap for them anyway.
+MAX_CANDIDATES = 1024 # orderings tried per board, over both orientations
+REFINE_ROUNDS  = 3
+
+@dataclass
+class Transform:
+    transpose: bool
+    row_order: Tuple[int, ...] # canonical row i is original row row_order[i] (after transposing)
+    col_order: Tuple[int, ...]
+    relabel:   Tuple[int, ...] # relabel[original digit] = canonical digit, relabel[0] == 0
+
+    def apply(self, board: List[List[int]]) -> List[List[int]]:
+        grid = transpose(board) if self.transpose else board
+        return [[self.relabel[grid[row][col]] for col in self.col_order] for row in self.row_order]
+
+    def invert(self, canonical: List[List[int]]) -> List[List[int]]:
+        # Map a canonical board (e.g. the cached solution) back to the caller's orientation.
+        unlabel = [0] * 10
+        for value in range(10):
+            unlabel[self.relabel[value]] = value
+        grid = [[0] * 9 for row in range(9)]
+        for i, row in enumerate(self.row_order):
+            for j, col in enumerate(self.col_order):
+                grid[row][col] = unlabel[canonical[i][j]]
+        return transpose(grid) if self.transpose else grid
+
+def transpose(board: List[List[int]]) -> List[List[int]]:
+    return [list(col) for col in zip(*board)]
+
+def to_ranks(values: list) -> List[int]:
+    # Replace each value by its position among the distinct values, smallest first.
+    index = {value: rank for rank, value in enumerate(sorted(set(values)))}
+    return [index[value] for value in values]
+
+def line_ranks(grid: List[List[int]], cross_ranks: List[int], digit_counts: List[int]) -> List[int]:
+    # Rank the rows of grid by what no symmetry changes: per stack, the box's clue count
+    # and, per cell, the digit's count on the board and the column's rank, all unordered.
+    box_counts = [sum(1 for row in range(band * 3, band * 3 + 3) for col in range(stack * 3, stack * 3 + 3) if grid[row][col])
+                  for band in range(3) for stack in range(3)]
+    invariants = []
+    for row in range(9):
+        segments = []
+        for stack in range(3):
+            cells = sorted((digit_counts[grid[row][col]], cross_ranks[col]) if grid[row][col] else (0, -1)
+                           for col in range(stack * 3, stack * 3 + 3))
+            segments.append((box_counts[row // 3 * 3 + stack], tuple(cells)))
+        invariants.append(tuple(sorted(segments)))
+    return to_ranks(invariants)
+
+def line_orders(ranks: List[int]) -> List[Tuple[int, ...]]:
+    '''
+    Every order of the nine lines that keeps bands together, sorts lines inside a band
+    by rank and bands by their lines' ranks, with tied lines and tied bands taken in
+    every possible order.
+    '''
+    band_choices = []
+    for band in range(3):
+        lines = sorted(range(band * 3, band * 3 + 3), key=lambda line: ranks[line])
+        groups = [list(group) for rank, group in groupby(lines, key=lambda line: ranks[line])]
+        band_choices.append([sum(choice, ()) for choice in product(*(permutations(group) for group in groups))])
+    band_keys = [sorted(ranks[line] for line in range(band * 3, band * 3 + 3)) for band in range(3)]
+    bands = sorted(range(3), key=lambda band: band_keys[band])
+    band_orders = product(*(permutations(tuple(group)) for key, group in groupby(bands, key=lambda band: band_keys[band])))
+    orders = []
+    for band_order in band_orders:
+        band_order = sum(band_order, ())
+        orders.extend(sum(lines, ()) for lines in product(*(band_choices[band] for band in band_order)))
+    return orders
+
+def count_orders(ranks: List[int]) -> int:
+    # len(line_orders(ranks)), without listing them.
+    count = 1
+    for band in range(3):
+        for rank, group in groupby(sorted(ranks[band * 3: band * 3 + 3])):
+            count *= math.factorial(len(list(group)))
+    band_keys = sorted(tuple(sorted(ranks[band * 3: band * 3 + 3])) for band in range(3))
+    for key, group in groupby(band_keys):
+        count *= math.factorial(len(list(group)))
+    return count
+
+def oriented_orders(grid: List[List[int]]) -> Tuple[List[int], List[int]]:
+    # Row and column ranks of grid, refined against each other.
+    digit_counts = [0] * 10
+    for row in grid:
+        for value in row:
+            digit_counts[value] += 1
+    cross_grid = transpose(grid)
+    col_ranks  = [0] * 9
+    for _ in range(REFINE_ROUNDS):
+        row_ranks = line_ranks(grid, col_ranks, digit_counts)
+        col_ranks = line_ranks(cross_grid, row_ranks, digit_counts)
+    return row_ranks, col_ranks
+
+def relabel_in_order(grid: List[List[int]], row_order, col_order) -> Tuple[bytes, Tuple[int, ...]]:
+    # grid read in the given order, digits numbered by first appearance, and that numbering.
+    relabel = [0] * 10
+    next_label = 1
+    for row in row_order:
+        for col in col_order:
+            value = grid[row][col]
+            if value and not relabel[value]:
+                relabel[value] = next_label
+                next_label += 1
+    for value in range(1, 10):
+        if not relabel[value]:
+            relabel[value] = next_label
+            next_label += 1
+    return bytes(48 + relabel[grid[row][col]] for row in row_order for col in col_order), tuple(relabel)
+
+def canonicalize(board: List[List[int]]) -> Optional[Tuple[bytes, Transform]]:
+    '''
+    Return the canonical puzzle (packed like board_to_bytes) and the transform from board
+    to it, or None if board ties in too many ways to try them all (see MAX_CANDIDATES).
+    Every board equivalent to board gets the same result.
+    '''
+    orientations = []
+    candidates   = 0
+    for transposed, grid in ((False, board), (True, transpose(board))):
+        row_ranks, col_ranks = oriented_orders(grid)
+        candidates += count_orders(row_ranks) * count_orders(col_ranks)
+        orientations.append((transposed, grid, row_ranks, col_ranks))
+    if candidates > MAX_CANDIDATES:
+        return None
+
+    best = None
+    for transposed, grid, row_ranks, col_ranks in orientations:
+        col_orders = line_orders(col_ranks)
+        for row_order in line_orders(row_ranks):
+            for col_order in col_orders:
+                key, relabel = relabel_in_order(grid, row_order, col_order)
+                if best is None or key < best[0]:
+                    best = (key, Transform(transposed, row_order, col_order, relabel))
+    return best
+
+class SolutionCache:
+    '''
+    LRU cache of solutions in front of solve_board. solve() has the same contract as
+    solve_board (fills in board, returns (is_solved, msg)) but looks the canonical form
+    of the board up first, so repeats and symmetric variants of a puzzle are solved
+    once. Failures are cached too. hits and misses count lookups.
+    '''
+
+    def __init__(self, maxsize: int = 4096, engine: str = "sets", techniques: Tuple[str, ...] = ()):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        sud.check_solver_options(engine, techniques)
+        self.maxsize    = maxsize
+        self.engine     = engine
+        self.techniques = techniques
+        self.hits       = 0
+        self.misses     = 0
+        self._entries   = OrderedDict() # canonical puzzle -> (is_solved, msg, canonical solution)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def solve(self, board: List[List[int]]) -> Tuple[bool, str]:
+        # Only 9x9 boards of digits 0-9 can be relabeled. Anything else goes straight to
+        # the solver, which solves other sizes or rejects the board as usual, and so do
+        # boards without a canonical form.
+        try:
+            box_size = sud.board_shape(board)
+        except (ValueError, TypeError):
+            box_size = 0
+        if box_size != 3 or any(not 0 <= value <= 9 for row in board for value in row):
+            return sud.solve_board(board, self.engine, self.techniques)
+
+        canonical_form = canonicalize(board)
+        if canonical_form is None:
+            return sud.solve_board(board, self.engine, self.techniques)
+        key, transform = canonical_form
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            canonical = sud.bytes_to_board(key)
+            is_solved, msg = sud.solve_board(canonical, self.engine, self.techniques)
+            entry = (is_solved, msg, sud.board_to_bytes(canonical) if is_solved else None)
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        is_solved, msg, solution = entry
+        if is_solved:
+            solved = transform.invert(sud.bytes_to_board(solution))
+            for row in range(9):
+                board[row][:] = solved[row]
+        return is_solved, msg
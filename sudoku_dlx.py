@@ -0,0 +1,218 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Dancing Links (Knuth's Algorithm X) exact-cover backend.
+# A sudoku is an exact cover problem: every (cell, digit) placement is one of 729
+# matrix rows, and each placement covers 4 of the 324 constraint columns:
+#   cell r,c is filled | row r has digit d | col c has digit d | box b has digit d
+# A solution picks 81 rows so that every column is covered exactly once.
+#
+# The linked matrix is stored as flat int lists (node index -> neighbour index).
+# Node 0 is the root header, nodes 1..324 are the column headers and the 4 nodes
+# of matrix row k live at FIRST_ROW_NODE + 4 * k. The layout never changes, so it
+# is built once at import and every solve starts from a copy of it.
+NUM_COLUMNS    = 324
+NUM_ROWS       = 729
+ROOT           = 0
+FIRST_ROW_NODE = NUM_COLUMNS + 1
+NUM_NODES      = FIRST_ROW_NODE + 4 * NUM_ROWS
+
+def get_row_columns(cell: int, digit_idx: int):
+    # Constraint columns (1-based header nodes) covered by placing digit_idx + 1 at cell.
+    row, col = divmod(cell, 9)
+    box = 3 * (row // 3) + col // 3
+    return (1 + cell,
+            1 + 81  + row * 9 + digit_idx,
+            1 + 162 + col * 9 + digit_idx,
+            1 + 243 + box * 9 + digit_idx)
+
+def build_template():
+    left   = list(range(-1, NUM_NODES - 1))
+    right  = list(range(1, NUM_NODES + 1))
+    up     = list(range(NUM_NODES))
+    down   = list(range(NUM_NODES))
+    column = list(range(NUM_NODES))
+    size   = [0] * (NUM_COLUMNS + 1)
+
+    # Circular header list: root <-> 1 <-> ... <-> 324 <-> root
+    left[ROOT] = NUM_COLUMNS
+    right[NUM_COLUMNS] = ROOT
+
+    for matrix_row in range(NUM_ROWS):
+        cell, digit_idx = divmod(matrix_row, 9)
+        first = FIRST_ROW_NODE + 4 * matrix_row
+        for offset, col_header in enumerate(get_row_columns(cell, digit_idx)):
+            node = first + offset
+            # Circular row list of 4 nodes.
+            left[node]  = first + (offset - 1) % 4
+            right[node] = first + (offset + 1) % 4
+            # Append to the bottom of the column.
+            column[node] = col_header
+            up[node]     = up[col_header]
+            down[node]   = col_header
+            down[up[col_header]] = node
+            up[col_header]       = node
+            size[col_header]    += 1
+
+    return left, right, up, down, column, size
+
+TEMPLATE_LEFT, TEMPLATE_RIGHT, TEMPLATE_UP, TEMPLATE_DOWN, COLUMN, TEMPLATE_SIZE = build_template()
+
+@dataclass
+class DLXState:
+    left:  List[int]
+    right: List[int]
+    up:    List[int]
+    down:  List[int]
+    size:  List[int]
+
+    @staticmethod
+    def fresh():
+        return DLXState(TEMPLATE_LEFT[:], TEMPLATE_RIGHT[:], TEMPLATE_UP[:], TEMPLATE_DOWN[:], TEMPLATE_SIZE[:])
+
+def cover(state: DLXState, col_header: int) -> None:
+    left, right, up, down, size = state.left, state.right, state.up, state.down, state.size
+    right[left[col_header]] = right[col_header]
+    left[right[col_header]] = left[col_header]
+    i = down[col_header]
+    while i != col_header:
+        j = right[i]
+        while j != i:
+            down[up[j]] = down[j]
+            up[down[j]] = up[j]
+            size[COLUMN[j]] -= 1
+            j = right[j]
+        i = down[i]
+
+def uncover(state: DLXState, col_header: int) -> None:
+    left, right, up, down, size = state.left, state.right, state.up, state.down, state.size
+    i = up[col_header]
+    while i != col_header:
+        j = left[i]
+        while j != i:
+            size[COLUMN[j]] += 1
+            down[up[j]] = j
+            up[down[j]] = j
+            j = left[j]
+        i = up[i]
+    right[left[col_header]] = col_header
+    left[right[col_header]] = col_header
+
+def node_to_placement(node: int):
+    # Return (cell, value) for the matrix row that node belongs to.
+    cell, digit_idx = divmod((node - FIRST_ROW_NODE) // 4, 9)
+    return cell, digit_idx + 1
+
+def search(state: DLXState, chosen: List[int], budget=None) -> bool:
+    '''
+    Algorithm X. Appends the chosen row nodes to chosen and returns True on the first
+    exact cover found; on failure chosen is left as it was passed in. budget, if given,
+    is charged once per call (see sudoku_penciling.SolveBudget); the state is left
+    half-covered if that raises, so it must not be searched again.
+    '''
+    if budget is not None:
+        budget.charge()
+    right, down, size = state.right, state.down, state.size
+    if right[ROOT] == ROOT:
+        return True
+
+    # Branch on the column with the fewest remaining rows.
+    col_header = right[ROOT]
+    min_size   = size[col_header]
+    j = right[col_header]
+    while j != ROOT and min_size > 1:
+        if size[j] < min_size:
+            col_header, min_size = j, size[j]
+        j = right[j]
+    if min_size == 0:
+        return False
+
+    cover(state, col_header)
+    i = down[col_header]
+    while i != col_header:
+        chosen.append(i)
+        j = right[i]
+        while j != i:
+            cover(state, COLUMN[j])
+            j = right[j]
+
+        if search(state, chosen, budget):
+            return True
+
+        j = state.left[i]
+        while j != i:
+            uncover(state, COLUMN[j])
+            j = state.left[j]
+        chosen.pop()
+        i = down[i]
+    uncover(state, col_header)
+    return False
+
+def count_covers(state: DLXState, limit: int) -> int:
+    # Like search(), but keeps going after a hit and returns the number of exact covers
+    # found, stopping as soon as it reaches limit. The state is restored on return.
+    right, down, size = state.right, state.down, state.size
+    if right[ROOT] == ROOT:
+        return 1
+
+    col_header = right[ROOT]
+    min_size   = size[col_header]
+    j = right[col_header]
+    while j != ROOT and min_size > 1:
+        if size[j] < min_size:
+            col_header, min_size = j, size[j]
+        j = right[j]
+    if min_size == 0:
+        return 0
+
+    count = 0
+    cover(state, col_header)
+    i = down[col_header]
+    while i != col_header and count < limit:
+        j = right[i]
+        while j != i:
+            cover(state, COLUMN[j])
+            j = right[j]
+
+        count += count_covers(state, limit - count)
+
+        j = state.left[i]
+        while j != i:
+            uncover(state, COLUMN[j])
+            j = state.left[j]
+        i = down[i]
+    uncover(state, col_header)
+    return count
+
+def init_dlx_state(board: List[List[int]]) -> DLXState:
+    '''
+    Build the linked matrix with the given clues already selected. The clues must be
+    between 1 and 9 and consistent with each other (see sudoku_penciling.init_group_sets).
+    '''
+    state = DLXState.fresh()
+    for row in range(9):
+        for col in range(9):
+            value = board[row][col]
+            if value == 0:
+                continue
+            first = FIRST_ROW_NODE + 4 * ((row * 9 + col) * 9 + value - 1)
+            for node in range(first, first + 4):
+                cover(state, COLUMN[node])
+    return state
+
+def solve_dlx(board: List[List[int]], budget=None) -> Optional[List[int]]:
+    # Return the solved board as a flat list of 81 values, or None if there is no solution.
+    state  = init_dlx_state(board)
+    chosen = []
+    if not search(state, chosen, budget):
+        return None
+
+    solution = [board[row][col] for row in range(9) for col in range(9)]
+    for node in chosen:
+        cell, value = node_to_placement(node)
+        solution[cell] = value
+    return solution
+
+def count_dlx(board: List[List[int]], limit: int) -> int:
+    # Number of solutions of a board with consistent clues, counting no further than limit.
+    return count_covers(init_dlx_state(board), limit)
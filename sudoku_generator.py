@@ -0,0 +1,124 @@
+import random
+import time
+from typing import List, Optional, Tuple
+import sudoku_penciling as sud
+import sudoku_rater
+
+# Puzzle generator.
+# Unlike spawn(), which scatters random clues and may produce an unsolvable board,
+# generate_puzzle() starts from a random solved grid and removes clues one at a time,
+# putting a clue back whenever removing it would allow a second solution. Every board
+# it returns therefore has exactly one solution, and it never has to retry.
+
+# Clue counts aimed for per difficulty level. Clue removal stops early once no clue
+# can be taken away without losing uniqueness, which mostly matters for EXPERT.
+DIFFICULTY_CLUES = {
+    "EASY":   38,
+    "MEDIUM": 32,
+    "HARD":   28,
+    "EXPERT": 24,
+}
+
+def random_full_grid(rng: random.Random = random) -> List[List[int]]:
+    # The three boxes on the diagonal don't constrain each other, so fill them with
+    # random permutations and let the solver complete the rest of the grid.
+    board = [[0 for _ in range(9)] for _ in range(9)]
+    for box in range(3):
+        values = rng.sample(range(1, 10), 9)
+        for i, value in enumerate(values):
+            board[3 * box + i // 3][3 * box + i % 3] = value
+    is_solved, msg = sud.solve_board(board, "bits")
+    assert is_solved
+    return board
+
+def remove_clues(solution: List[List[int]], target_clues: int, rng: random.Random = random) -> List[List[int]]:
+    '''
+    Remove clues from a solved grid, in random order, while the puzzle keeps a unique
+    solution, until target_clues remain or no clue can be removed. The uniqueness
+    checks run on the Dancing Links counter, which stays fast on sparse boards.
+    '''
+    puzzle = [row[:] for row in solution]
+    clues  = 81
+    cells  = list(range(81))
+    rng.shuffle(cells)
+    for idx in cells:
+        if clues <= target_clues:
+            break
+        row, col = sud.CELL_COORDS[idx]
+        value = puzzle[row][col]
+        puzzle[row][col] = 0
+        if sud.count_solutions(puzzle, 2, "dlx") == 1:
+            clues -= 1
+        else:
+            puzzle[row][col] = value
+    return puzzle
+
+def match_grade(puzzle: List[List[int]], solution: List[List[int]], grade: str,
+                rng: random.Random = random, max_steps: int = 40) -> List[List[int]]:
+    '''
+    Walk a unique puzzle towards a sudoku_rater grade: while it rates too hard, give
+    back a random clue from solution; while it rates too easy, remove another clue that
+    keeps the solution unique. Stops when the grade matches, when no clue can be
+    removed, or after max_steps re-ratings, so it may return a different grade.
+    '''
+    target = sudoku_rater.GRADE_ORDER.index(grade)
+    puzzle = [row[:] for row in puzzle]
+    for _ in range(max_steps):
+        current = sudoku_rater.GRADE_ORDER.index(sudoku_rater.rate(puzzle).grade)
+        if current == target:
+            break
+        if current > target:
+            empty = [idx for idx, (row, col) in enumerate(sud.CELL_COORDS) if puzzle[row][col] == 0]
+            row, col = sud.CELL_COORDS[rng.choice(empty)]
+            puzzle[row][col] = solution[row][col]
+            continue
+
+        filled = [idx for idx, (row, col) in enumerate(sud.CELL_COORDS) if puzzle[row][col] != 0]
+        rng.shuffle(filled)
+        for idx in filled:
+            row, col = sud.CELL_COORDS[idx]
+            puzzle[row][col] = 0
+            if sud.count_solutions(puzzle, 2, "dlx") == 1:
+                break
+            puzzle[row][col] = solution[row][col]
+        else:
+            break
+    return puzzle
+
+def generate_puzzle(difficulty: str = "MEDIUM", target_clues: Optional[int] = None,
+                    rng: random.Random = random, grade: Optional[str] = None,
+                    grade_attempts: int = 20) -> Tuple[List[List[int]], List[List[int]]]:
+    '''
+    Return (puzzle, solution) where puzzle has exactly one solution. target_clues
+    overrides the clue count of difficulty (a key of DIFFICULTY_CLUES); the puzzle may
+    keep more clues than that if it becomes minimal first. If grade (one of
+    sudoku_rater.GRADE_ORDER) is given, the puzzle is then adjusted with match_grade
+    so that its technique rating, not just its clue count, hits that grade. Some grids
+    have no minimal puzzle of the wanted grade, so up to grade_attempts grids are
+    tried; if none works out the last puzzle is returned with whatever grade it has.
+    '''
+    if grade is not None and grade not in sudoku_rater.GRADE_ORDER:
+        raise ValueError("Unknown grade {}, expected one of {}".format(grade, sudoku_rater.GRADE_ORDER))
+    if target_clues is None:
+        if difficulty not in DIFFICULTY_CLUES:
+            raise ValueError("Unknown difficulty {}, expected one of {}".format(difficulty, tuple(DIFFICULTY_CLUES)))
+        target_clues = DIFFICULTY_CLUES[difficulty]
+    if not 17 <= target_clues <= 81:
+        raise ValueError("target_clues must be between 17 and 81")
+    for _ in range(max(grade_attempts, 1) if grade is not None else 1):
+        solution = random_full_grid(rng)
+        puzzle = remove_clues(solution, target_clues, rng)
+        if grade is None:
+            break
+        puzzle = match_grade(puzzle, solution, grade, rng)
+        if sudoku_rater.rate(puzzle).grade == grade:
+            break
+    return puzzle, solution
+
+def measure_throughput(count: int = 20, difficulty: str = "MEDIUM", target_clues: Optional[int] = None,
+                       rng: random.Random = random, grade: Optional[str] = None) -> float:
+    # Generate count puzzles and return the rate in puzzles per second.
+    start = time.perf_counter()
+    for _ in range(count):
+        generate_puzzle(difficulty, target_clues, rng, grade)
+    return count / (time.perf_counter() - start)
@@ -0,0 +1,276 @@
+import math
+import random
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import sudoku_penciling as sud
+
+# Sudoku of any size.
+# A grid with box size b has side n = b * b (4, 9, 16, 25, ...), n rows, columns and
+# boxes, and the values 1..n. The engine here is the bits engine made generic: every
+# cell is an int with bit v-1 set while v is still a candidate, plus a finalized bit
+# 1 << n. Python ints hold 25 candidates as cheaply as 9, but lookup tables of 2**25
+# entries are out of the question, so "exactly one candidate" is tested with
+# mask & (mask - 1) and counted with bit_count. Naked singles alone leave big grids
+# to the search far too early, so winnow_grid also applies hidden singles.
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(mask: int) -> int:
+        return bin(mask).count("1")
+
+@dataclass(frozen=True)
+class Geometry:
+    box_size:       int
+    side:           int
+    num_cells:      int
+    all_candidates: int
+    finalized_bit:  int
+    unit_cells:     tuple # rows, then columns, then boxes, as flat cell indices
+    cell_units:     tuple # (row, column, box) unit index of every cell
+    peers:          tuple # the other cells sharing a unit with every cell
+
+@lru_cache(maxsize=None)
+def get_geometry(box_size: int) -> Geometry:
+    if box_size < 1:
+        raise ValueError("box_size must be at least 1")
+    side       = box_size * box_size
+    unit_cells = sud.make_unit_cells(box_size)
+    cell_units = tuple((row, side + col, 2 * side + sud.get_box_idx(row, col, box_size))
+                       for row, col in (divmod(idx, side) for idx in range(side * side)))
+    peers = tuple(tuple(sorted(set().union(*(unit_cells[unit] for unit in units)) - { idx }))
+                  for idx, units in enumerate(cell_units))
+    return Geometry(box_size, side, side * side, (1 << side) - 1, 1 << side, unit_cells, cell_units, peers)
+
+def geometry_for(board: List[List[int]]) -> Geometry:
+    # The Geometry matching the size of board. Raises ValueError if it isn't N^2 x N^2.
+    side     = len(board)
+    box_size = math.isqrt(side)
+    if side == 0 or box_size * box_size != side or any(len(row) != side for row in board):
+        raise ValueError("Board must be an N^2 x N^2 grid, got {} rows".format(side))
+    return get_geometry(box_size)
+
+def init_grid_cells(board: List[List[int]], geometry: Geometry) -> List[int]:
+    '''
+    Candidate masks for board, flat and row by row. Raises sud.InvalidBoard for
+    values outside 0..side or conflicting clues.
+    '''
+    side       = geometry.side
+    unit_masks = [0] * (3 * side)
+    cells      = [0] * geometry.num_cells
+    for idx in range(geometry.num_cells):
+        value = board[idx // side][idx % side]
+        if value == 0:
+            continue
+        if not 0 < value <= side:
+            raise sud.InvalidBoard(sud.find_conflicts(board))
+        cur_bit = 1 << (value - 1)
+        for unit in geometry.cell_units[idx]:
+            if unit_masks[unit] & cur_bit:
+                raise sud.InvalidBoard(sud.find_conflicts(board))
+            unit_masks[unit] |= cur_bit
+        cells[idx] = cur_bit | geometry.finalized_bit
+
+    for idx in range(geometry.num_cells):
+        if cells[idx] == 0:
+            row, col, box = geometry.cell_units[idx]
+            cells[idx] = geometry.all_candidates & ~(unit_masks[row] | unit_masks[col] | unit_masks[box])
+    return cells
+
+def winnow_grid(cells: List[int], geometry: Geometry, trail: Optional[List[Tuple[int, int]]] = None) -> bool:
+    '''
+    Naked and hidden singles until neither makes progress. Returns False on a
+    contradiction, leaving cells inconsistent. If trail is given, (idx, previous mask)
+    is appended to it for every mask changed, as in winnow_bits.
+    '''
+    finalized_bit  = geometry.finalized_bit
+    all_candidates = geometry.all_candidates
+    peers  = geometry.peers
+    record = trail.append if trail is not None else None
+    single_candidate_cells = [idx for idx, cur_mask in enumerate(cells)
+                              if cur_mask < finalized_bit and cur_mask & (cur_mask - 1) == 0]
+    while True:
+        while single_candidate_cells:
+            cur_idx = single_candidate_cells.pop()
+            cur_bit = cells[cur_idx]
+            if cur_bit >= finalized_bit:
+                continue
+            if record:
+                record((cur_idx, cur_bit))
+            cells[cur_idx] = cur_bit | finalized_bit
+
+            for peer in peers[cur_idx]:
+                peer_mask = cells[peer]
+                if peer_mask & cur_bit and peer_mask < finalized_bit:
+                    if record:
+                        record((peer, peer_mask))
+                    peer_mask ^= cur_bit
+                    cells[peer] = peer_mask
+                    if peer_mask == 0:
+                        return False
+                    if peer_mask & (peer_mask - 1) == 0:
+                        single_candidate_cells.append(peer)
+
+        # Hidden singles: a value that fits in only one open cell of a unit goes there.
+        for unit in geometry.unit_cells:
+            seen_once = seen_twice = placed = 0
+            for idx in unit:
+                cur_mask = cells[idx]
+                if cur_mask >= finalized_bit:
+                    placed |= cur_mask
+                else:
+                    seen_twice |= seen_once & cur_mask
+                    seen_once  |= cur_mask
+            placed &= all_candidates
+            if seen_once | placed != all_candidates:
+                return False
+            hidden = seen_once & ~seen_twice & ~placed
+            if not hidden:
+                continue
+            for idx in unit:
+                cur_mask = cells[idx]
+                if cur_mask < finalized_bit and cur_mask & hidden and cur_mask & (cur_mask - 1):
+                    cur_bit = cur_mask & hidden
+                    if cur_bit & (cur_bit - 1):
+                        return False # two values that each only fit in this cell
+                    if record:
+                        record((idx, cur_mask))
+                    cells[idx] = cur_bit
+                    single_candidate_cells.append(idx)
+
+        if not single_candidate_cells:
+            return True
+
+def search_grid(cells: List[int], geometry: Geometry, limit: int,
+                budget: Optional[sud.SolveBudget] = None) -> Tuple[int, Optional[List[int]]]:
+    # Same iterative, trail-based search as search_bits, on winnow_grid. Returns (number
+    # of solutions found, stopping at limit; cells of the first one).
+    trail = []
+    stack = [] # search frames, see sud.next_branch
+    count    = 0
+    solution = None
+    while True:
+        if budget is not None:
+            budget.charge()
+        if winnow_grid(cells, geometry, trail):
+            guess_idx = sud.pick_guess_cell(cells, geometry.finalized_bit, popcount)
+            if guess_idx >= 0:
+                stack.append([len(trail), guess_idx, cells[guess_idx], 0])
+            else:
+                count += 1
+                if solution is None:
+                    solution = cells[:]
+                if count >= limit:
+                    return count, solution
+
+        if sud.next_branch(cells, trail, stack) < 0:
+            return count, solution
+
+def solve_grid(board: List[List[int]], max_nodes: Optional[int] = None, deadline: Optional[float] = None,
+               cancel=None) -> Tuple[bool, str]:
+    '''
+    Solve an N^2 x N^2 board in place. Returns (is_solved, msg) like solve_board, and
+    takes the same search bounds; a board of the wrong shape is "invalid".
+    '''
+    return solve_grid_budgeted(board, sud.make_budget(max_nodes, deadline, cancel))
+
+def solve_grid_budgeted(board: List[List[int]], budget: Optional[sud.SolveBudget]) -> Tuple[bool, str]:
+    # solve_grid with a SolveBudget made by the caller, like solve_board_budgeted.
+    try:
+        geometry = geometry_for(board)
+        cells = init_grid_cells(board, geometry)
+        count, solution = search_grid(cells, geometry, 1, budget)
+    except sud.SolveTimeout:
+        return False, "timeout"
+    except Exception as e:
+        return False, "invalid"
+
+    if solution is None:
+        return False, "unsolvable"
+    side = geometry.side
+    for idx, cur_mask in enumerate(solution):
+        board[idx // side][idx % side] = (cur_mask & geometry.all_candidates).bit_length()
+    return True, ""
+
+def count_grid_solutions(board: List[List[int]], limit: int = 2, max_nodes: Optional[int] = None) -> int:
+    # Like count_solutions, for any size. Raises SolveTimeout once max_nodes is exceeded.
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    geometry = geometry_for(board)
+    try:
+        cells = init_grid_cells(board, geometry)
+    except Exception as e:
+        return 0
+    return search_grid(cells, geometry, limit, sud.make_budget(max_nodes))[0]
+
+def random_full_grid_of_size(box_size: int, rng: random.Random = random) -> List[List[int]]:
+    # The shifted pattern value(r, c) = (box_size * (r % b) + r // b + c) % side is a valid
+    # grid; shuffling rows within bands, bands, columns within stacks, stacks and values
+    # keeps it valid. Unlike random_full_grid this needs no search, which matters at 25x25.
+    side = box_size * box_size
+    def shuffled_lines() -> List[int]:
+        bands = rng.sample(range(box_size), box_size)
+        return [band * box_size + line for band in bands for line in rng.sample(range(box_size), box_size)]
+    rows, cols = shuffled_lines(), shuffled_lines()
+    values = rng.sample(range(1, side + 1), side)
+    grid = [[values[(box_size * (row % box_size) + row // box_size + col) % side] for col in cols] for row in rows]
+    if rng.random() < 0.5:
+        grid = [list(col) for col in zip(*grid)]
+    return grid
+
+def default_clues(box_size: int) -> int:
+    # About the share of clues of a MEDIUM 9x9 puzzle.
+    side = box_size * box_size
+    return max(round(0.4 * side * side), 1)
+
+def generate_grid(box_size: int = 3, target_clues: Optional[int] = None, rng: random.Random = random,
+                  max_nodes: int = 200) -> Tuple[List[List[int]], List[List[int]]]:
+    '''
+    Return (puzzle, solution) for an N^2 x N^2 grid, with a unique solution, removing
+    clues like remove_clues. On big grids a uniqueness check can run into a long search,
+    so each one may take max_nodes search nodes; if it needs more the clue stays.
+    '''
+    side = box_size * box_size
+    if target_clues is None:
+        target_clues = default_clues(box_size)
+    if not 0 <= target_clues <= side * side:
+        raise ValueError("target_clues must be between 0 and {}".format(side * side))
+    solution = random_full_grid_of_size(box_size, rng)
+    puzzle   = [row[:] for row in solution]
+    clues    = side * side
+    cells    = list(range(side * side))
+    rng.shuffle(cells)
+    for idx in cells:
+        if clues <= target_clues:
+            break
+        row, col = divmod(idx, side)
+        puzzle[row][col] = 0
+        try:
+            is_unique = count_grid_solutions(puzzle, 2, max_nodes) == 1
+        except sud.SolveTimeout:
+            is_unique = False
+        if is_unique:
+            clues -= 1
+        else:
+            puzzle[row][col] = solution[row][col]
+    return puzzle, solution
+
+def measure_grid_throughput(box_size: int, count: int = 10, target_clues: Optional[int] = None,
+                            rng: random.Random = random) -> Dict[str, float]:
+    # Generate count puzzles of one size and return the generate and solve rates in puzzles per second.
+    start   = time.perf_counter()
+    puzzles = [generate_grid(box_size, target_clues, rng)[0] for _ in range(count)]
+    generated = time.perf_counter()
+    for puzzle in puzzles:
+        is_solved, msg = solve_grid(puzzle)
+        assert is_solved
+    solved = time.perf_counter()
+    return { "generate_per_sec": count / (generated - start), "solve_per_sec": count / (solved - generated) }
+
+def benchmark_sizes(box_sizes: Iterable[int] = (2, 3, 4, 5), count: int = 3,
+                    rng: random.Random = random) -> Dict[int, Dict[str, float]]:
+    # measure_grid_throughput for every size, keyed by side. Generating 25x25 puzzles
+    # takes tens of seconds each, so leave 5 out of box_sizes for a quick run.
+    return { box_size * box_size: measure_grid_throughput(box_size, count, rng=rng) for box_size in box_sizes }
@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import sudoku_penciling as sud
+import sudoku_rater
+
+# Hints.
+# next_hint finds the cheapest next placement a player can make on a board as it
+# stands. It builds the candidates once from the filled cells and looks for a naked or
+# hidden single. When there is none it walks the rater's ladder in TECHNIQUE_COSTS
+# order, applies one pass of the cheapest technique that removes candidates (as rate()
+# would) and looks again, so the hint is always a cell to fill, together with the
+# steps that were needed to see it. The board holds no candidates, so a hint that only
+# removed candidates would come back unchanged on the next call.
+
+@dataclass
+class HintStep:
+    technique:    str                            # key of sudoku_rater.TECHNIQUE_COSTS
+    eliminations: Tuple[Tuple[int, int, int], ...] # (row, col, value) candidates removed
+
+@dataclass
+class Hint:
+    technique: str                     # "naked_single", "hidden_single" or "contradiction"
+    cells: Tuple[Tuple[int, int], ...] # the cell to fill, or the cells at fault
+    value: int = 0                     # value to fill in, for singles
+    unit: str = ""                     # e.g. "row 3", for hidden singles and values without a place
+    steps: Tuple[HintStep, ...] = ()   # eliminations that make the single appear, in order
+
+    @property
+    def cost(self) -> int:
+        # The hardest technique the hint relies on, as in sudoku_rater.rate().
+        return max(sudoku_rater.TECHNIQUE_COSTS.get(technique, 0)
+                   for technique in (self.technique,) + tuple(step.technique for step in self.steps))
+
+    def describe(self) -> str:
+        # For the player, with rows and columns counted from 1.
+        def cell_names(cells) -> str:
+            return ", ".join("({}, {})".format(row + 1, col + 1) for row, col in cells)
+
+        def step_text(step: HintStep) -> str:
+            removals = {}
+            for row, col, value in step.eliminations:
+                removals.setdefault(value, []).append((row, col))
+            return "{} removes {}".format(step.technique.replace("_", " ").capitalize(),
+                                          "; ".join("{} from {}".format(value, cell_names(cells))
+                                                    for value, cells in sorted(removals.items())))
+
+        if self.technique == "naked_single":
+            text = "Naked single: only {} fits at {}".format(self.value, cell_names(self.cells))
+        elif self.technique == "hidden_single":
+            text = "Hidden single: {} fits nowhere else in {} than {}".format(self.value, self.unit, cell_names(self.cells))
+        elif self.value:
+            text = "{} has no place left in {}; an earlier entry is wrong".format(self.value, self.unit)
+        elif self.cells:
+            text = "No value fits at {}; an earlier entry is wrong".format(cell_names(self.cells))
+        else:
+            text = "The entries contradict each other; an earlier entry is wrong"
+        if not self.steps:
+            return text
+        return ". ".join([step_text(step) for step in self.steps] + ["Then: " + text])
+
+def unit_name(unit_idx: int) -> str:
+    return "{} {}".format(sud.UNIT_KINDS[unit_idx // 9], unit_idx % 9 + 1)
+
+def find_single(state: sud.SolveState, open_cells: List[Tuple[int, int]]) -> Optional[Hint]:
+    # A naked or hidden single, or a contradiction, in the current candidates.
+    board_candidates = state.board_candidates
+    dead_cells = tuple(cell for cell in open_cells if not board_candidates[cell[0]][cell[1]])
+    if dead_cells:
+        return Hint("contradiction", dead_cells)
+    for row, col in open_cells:
+        if len(board_candidates[row][col]) == 1:
+            return Hint("naked_single", ((row, col),), next(iter(board_candidates[row][col])))
+    for unit_idx, unit in enumerate(sud.UNITS):
+        for value, cells in sorted(sud.get_unit_positions(state, unit).items()):
+            if len(cells) == 0:
+                return Hint("contradiction", tuple(cell for cell in unit if not state.is_finalized[cell[0]][cell[1]]),
+                            value, unit_name(unit_idx))
+            if len(cells) == 1:
+                return Hint("hidden_single", (cells[0],), value, unit_name(unit_idx))
+    return None
+
+def next_hint(board: List[List[int]]) -> Optional[Hint]:
+    '''
+    The cheapest placement on board, treating every filled cell as given, with the
+    technique steps needed before it shows (see Hint.steps). Returns None when the
+    board is full or nothing short of guessing leads to a placement, and a
+    "contradiction" hint when the filled cells leave a cell or a value without a
+    place. Raises sud.InvalidBoard if filled cells conflict. board is not modified.
+    '''
+    row_sets, col_sets, box_sets = sud.init_group_sets(board)
+    board_candidates, is_finalized = sud.init_board_candidates(board, row_sets, col_sets, box_sets)
+    open_cells = [(row, col) for row, col in sud.CELL_COORDS if not is_finalized[row][col]]
+    if not open_cells:
+        return None
+
+    state = sud.SolveState(board_candidates, is_finalized)
+    steps = []
+    while True:
+        hint = find_single(state, open_cells)
+        if hint is not None:
+            hint.steps = tuple(steps)
+            return hint
+
+        # Passes that make no progress leave the candidates alone, so one snapshot does.
+        before = [set(board_candidates[row][col]) for row, col in sud.CELL_COORDS]
+        for technique in sudoku_rater.LADDER:
+            if technique == "hidden_single":
+                continue # find_single already looked
+            is_valid, made_progress = sud.PROPAGATION_TECHNIQUES[technique](state, [])
+            if not is_valid:
+                return Hint("contradiction", tuple(cell for cell in open_cells if not board_candidates[cell[0]][cell[1]]),
+                            steps=tuple(steps))
+            if made_progress:
+                eliminations = tuple((row, col, value) for (row, col), old in zip(sud.CELL_COORDS, before)
+                                     for value in sorted(old - board_candidates[row][col]))
+                steps.append(HintStep(technique, eliminations))
+                break
+        else:
+            return None
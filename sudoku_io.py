@@ -0,0 +1,412 @@
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+import sudoku_penciling as sud
+
+class PuzzleFile:
+    '''
+    Read-only, memory-mapped view of a fixed-width puzzle file: every record is one
+    puzzle of 81 characters (0 or . for blanks) followed by a newline (\n or \r\n).
+    Records are handed out as memoryview slices of the mapping, so nothing is copied
+    until a solver reads the cells, and any record can be reached by index, which lets
+    workers split a file by offset. The views are only valid until close().
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._mmap = None
+            self._view = memoryview(b"")
+            self.record_size = 82
+            self._count = 0
+            return
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self.record_size = 83 if self._mmap[81:83] == b"\r\n" else 82
+        if self._mmap[self.record_size - 1:self.record_size] != b"\n" and size != 81:
+            self.close()
+            raise ValueError("{} is not a fixed-width puzzle file".format(path))
+        # The last record may come without its newline.
+        self._count, remainder = divmod(size, self.record_size)
+        if remainder == 81:
+            self._count += 1
+        elif remainder != 0:
+            self.close()
+            raise ValueError("{} is not a fixed-width puzzle file".format(path))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record_offset(self, index: int) -> int:
+        # Byte offset of record index in the file.
+        return index * self.record_size
+
+    def __getitem__(self, index: int) -> memoryview:
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("puzzle index out of range")
+        offset = self.record_offset(index)
+        return self._view[offset:offset + 81]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return self.iter_range(0, self._count)
+
+    def iter_range(self, start: int, stop: int) -> Iterator[memoryview]:
+        # Records start up to (not including) stop.
+        for index in range(max(start, 0), min(stop, self._count)):
+            offset = index * self.record_size
+            yield self._view[offset:offset + 81]
+
+    def records_array(self, start: int, stop: int):
+        # Records start up to (not including) stop as an (N, 81) uint8 numpy array that
+        # strides over the mapping, so nothing is copied. Valid until close(), like the
+        # memoryviews. Needs numpy.
+        import numpy as np
+        start, stop = max(start, 0), min(stop, self._count)
+        if stop <= start:
+            return np.zeros((0, 81), dtype=np.uint8)
+        return np.ndarray((stop - start, 81), dtype=np.uint8, buffer=self._view,
+                          offset=self.record_offset(start), strides=(self.record_size, 1))
+
+    def board(self, index: int) -> List[List[int]]:
+        # Record index as a 2D board, for callers of solve_sudoku and friends.
+        return sud.bytes_to_board(self[index])
+
+    def close(self) -> None:
+        # Every memoryview handed out must have been released (or dropped) before this.
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def solve_file_range(path: str, start: int, stop: int, engine: str = "sets",
+                     techniques: Tuple[str, ...] = ()) -> List[Tuple[bool, str, bytes]]:
+    # Worker side of solve_puzzle_file: map the file and solve records start..stop
+    # straight from the mapping. Only the results are copied out before it is closed.
+    with PuzzleFile(path) as puzzle_file:
+        if engine == "bits" and stop - start > 1 and sud.load_numpy():
+            records = puzzle_file.records_array(start, stop)
+            try:
+                return sud.solve_records_vectorized(records)
+            finally:
+                del records
+        puzzles = list(puzzle_file.iter_range(start, stop))
+        try:
+            return sud.solve_packed(puzzles, engine, techniques)
+        finally:
+            for puzzle in puzzles:
+                puzzle.release()
+
+def solve_puzzle_file(path: str, workers: Optional[int] = None, chunksize: int = 4096,
+                      engine: str = "sets", techniques: Tuple[str, ...] = ()) -> Iterator[Tuple[bool, str, bytes]]:
+    '''
+    Solve every record of a fixed-width puzzle file, yielding solve_packed_puzzle results
+    in file order. Workers only receive (path, start, stop) and map the file themselves,
+    so no puzzle data is pickled. workers=None uses every CPU, workers=1 solves in this
+    process. Like iter_solve_packed, at most two ranges per worker are in flight.
+    '''
+    with PuzzleFile(path) as puzzle_file:
+        count = len(puzzle_file)
+    yield from iter_solve_file_ranges(solve_file_range, path, count, workers, chunksize, engine, techniques)
+
+def iter_solve_file_ranges(solve_range: Callable, path: str, count: int, workers: Optional[int], chunksize: int,
+                           engine: str, techniques: Tuple[str, ...]) -> Iterator[Tuple[bool, str, bytes]]:
+    # Run solve_range(path, start, stop, engine, techniques) over records 0..count in chunks, in order.
+    sud.check_solver_options(engine, techniques)
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    ranges = [(start, min(start + chunksize, count)) for start in range(0, count, chunksize)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for start, stop in ranges:
+            yield from solve_range(path, start, stop, engine, techniques)
+        return
+    yield from sud.iter_pool_results(ranges, workers,
+                                     lambda executor, job: executor.submit(solve_range, path, *job, engine, techniques))
+
+# Packed binary puzzle files.
+# A compact alternative to the 82 bytes per puzzle of a text file:
+#   header   PACKED_HEADER: magic, format version, index stride, record count and the
+#            offset of the index, little-endian
+#   records  one after another; a record is the puzzle in 41 bytes, two cells per byte
+#            (high nibble first, 0 for a blank), optionally followed by its solution in
+#            41 more bytes. The low nibble of the last byte, which no cell uses, holds
+#            the record flags (HAS_SOLUTION)
+#   index    the offset of every INDEX_STRIDE-th record as a little-endian uint64, so
+#            a record is found by one index lookup and a walk over fewer than
+#            INDEX_STRIDE records, at a cost of 1/8 byte per record
+# The writer streams records out and fills in the header and index on close; the
+# reader memory-maps the file like PuzzleFile does.
+
+PACKED_MAGIC   = b"SDKP"
+PACKED_VERSION = 1
+PACKED_HEADER  = struct.Struct("<4sHHQQ")
+PACKED_SIZE    = 41
+INDEX_STRIDE   = 64
+HAS_SOLUTION   = 0x1
+
+# ASCII puzzle byte -> cell value, 0xFF for bytes that are not a digit or '.'.
+CELL_VALUES = bytes(value - 48 if 48 <= value <= 57 else 0 if value == 46 else 0xFF for value in range(256))
+# Packed byte -> its two cells as ASCII digits.
+CELL_PAIRS  = [bytes((48 + (value >> 4), 48 + (value & 0xF))) for value in range(256)]
+
+def pack_puzzle(puzzle, flags: int = 0) -> bytes:
+    # 81-character puzzle (0 or . for blanks) -> 41 bytes, with flags in the spare nibble.
+    if len(puzzle) != 81:
+        raise ValueError("Packed puzzle must be 81 bytes, got {}".format(len(puzzle)))
+    cells = bytes(puzzle).translate(CELL_VALUES)
+    if 0xFF in cells:
+        raise ValueError("Packed puzzle may only contain digits and '.'")
+    return bytes(high << 4 | low for high, low in zip(cells[0::2], cells[1::2] + bytes((flags,))))
+
+def unpack_puzzle(record) -> bytes:
+    # Inverse of pack_puzzle: the first 41 bytes of record -> 81 ASCII digits.
+    return b"".join([CELL_PAIRS[value] for value in record[:PACKED_SIZE]])[:81]
+
+class PackedPuzzleWriter:
+    '''
+    Streaming writer of a packed puzzle file. write() appends one puzzle (81 characters,
+    0 or . for blanks) and optionally its solution; close() writes the index and header.
+    '''
+
+    def __init__(self, path: str):
+        self.path  = path
+        self.count = 0
+        self._file = open(path, "wb")
+        self._file.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, INDEX_STRIDE, 0, 0))
+        self._position = PACKED_HEADER.size
+        self._index    = []
+
+    def write(self, puzzle, solution=None) -> None:
+        if self.count % INDEX_STRIDE == 0:
+            self._index.append(self._position)
+        if solution is None:
+            record = pack_puzzle(puzzle)
+        else:
+            record = pack_puzzle(puzzle, HAS_SOLUTION) + pack_puzzle(solution)
+        self._file.write(record)
+        self._position += len(record)
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.write(struct.pack("<{}Q".format(len(self._index)), *self._index))
+        self._file.seek(0)
+        self._file.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, INDEX_STRIDE, self.count, self._position))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_packed_header(header: bytes) -> Tuple[int, int, int]:
+    # (index stride, record count, index offset) of a packed file, checking its magic and version.
+    if len(header) < PACKED_HEADER.size:
+        raise ValueError("Not a packed puzzle file")
+    magic, version, stride, count, index_offset = PACKED_HEADER.unpack_from(header)
+    if magic != PACKED_MAGIC:
+        raise ValueError("Not a packed puzzle file")
+    if version != PACKED_VERSION:
+        raise ValueError("Unsupported packed puzzle file version {}".format(version))
+    if stride < 1:
+        raise ValueError("Corrupt packed puzzle file header")
+    return stride, count, index_offset
+
+def is_packed_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+class PackedPuzzleFile:
+    '''
+    Read-only, memory-mapped packed puzzle file. Indexing and iteration hand out puzzles
+    as 81 ASCII digits, which solve_packed and bytes_to_board take as they are;
+    solution(index) and iter_records() also give the stored solutions.
+    '''
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("{} is not a packed puzzle file".format(path))
+        try:
+            self.stride, self._count, self._index_offset = read_packed_header(self._mmap)
+        except ValueError as e:
+            self.close()
+            raise ValueError("{}: {}".format(path, e))
+        if self._index_offset + 8 * -(-self._count // self.stride) > len(self._mmap):
+            self.close()
+            raise ValueError("{} is truncated".format(path))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record_length(self, offset: int) -> int:
+        return 2 * PACKED_SIZE if self._mmap[offset + PACKED_SIZE - 1] & HAS_SOLUTION else PACKED_SIZE
+
+    def record_offset(self, index: int) -> int:
+        # Byte offset of record index: look up the nearest indexed record and walk from there.
+        block, skip = divmod(index, self.stride)
+        offset, = struct.unpack_from("<Q", self._mmap, self._index_offset + 8 * block)
+        for _ in range(skip):
+            offset += self.record_length(offset)
+        return offset
+
+    def check_index(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("puzzle index out of range")
+        return index
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = self.record_offset(self.check_index(index))
+        return unpack_puzzle(self._mmap[offset:offset + PACKED_SIZE])
+
+    def solution(self, index: int) -> Optional[bytes]:
+        # Stored solution of record index as 81 ASCII digits, or None.
+        offset = self.record_offset(self.check_index(index))
+        if self.record_length(offset) == PACKED_SIZE:
+            return None
+        return unpack_puzzle(self._mmap[offset + PACKED_SIZE:offset + 2 * PACKED_SIZE])
+
+    def board(self, index: int) -> List[List[int]]:
+        # Record index as a 2D board, for callers of solve_sudoku and friends.
+        return sud.bytes_to_board(self[index])
+
+    def __iter__(self) -> Iterator[bytes]:
+        for puzzle, _ in self.iter_records(0, self._count):
+            yield puzzle
+
+    def iter_records(self, start: int, stop: int) -> Iterator[Tuple[bytes, Optional[bytes]]]:
+        # (puzzle, solution or None) for records start up to (not including) stop.
+        start, stop = max(start, 0), min(stop, self._count)
+        if start >= stop:
+            return
+        offset = self.record_offset(start)
+        for _ in range(start, stop):
+            record = self._mmap[offset:offset + 2 * PACKED_SIZE]
+            if record[PACKED_SIZE - 1] & HAS_SOLUTION:
+                yield unpack_puzzle(record), unpack_puzzle(record[PACKED_SIZE:])
+                offset += 2 * PACKED_SIZE
+            else:
+                yield unpack_puzzle(record), None
+                offset += PACKED_SIZE
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def iter_packed_stream(stream: BinaryIO) -> Iterator[Tuple[bytes, Optional[bytes]]]:
+    # (puzzle, solution or None) for every record of a packed file read front to back,
+    # e.g. from a pipe. Stops at the index, which sequential reading doesn't need.
+    _, count, _ = read_packed_header(stream.read(PACKED_HEADER.size))
+    for _ in range(count):
+        record = stream.read(PACKED_SIZE)
+        if len(record) != PACKED_SIZE:
+            raise ValueError("Packed puzzle file is truncated")
+        if record[-1] & HAS_SOLUTION:
+            solution = stream.read(PACKED_SIZE)
+            if len(solution) != PACKED_SIZE:
+                raise ValueError("Packed puzzle file is truncated")
+            yield unpack_puzzle(record), unpack_puzzle(solution)
+        else:
+            yield unpack_puzzle(record), None
+
+def solve_packed_file_range(path: str, start: int, stop: int, engine: str = "sets",
+                            techniques: Tuple[str, ...] = ()) -> List[Tuple[bool, str, bytes]]:
+    # Worker side of solve_packed_file: map the file and solve records start..stop.
+    with PackedPuzzleFile(path) as packed_file:
+        puzzles = [puzzle for puzzle, _ in packed_file.iter_records(start, stop)]
+    return sud.solve_packed(puzzles, engine, techniques)
+
+def solve_packed_file(path: str, workers: Optional[int] = None, chunksize: int = 4096,
+                      engine: str = "sets", techniques: Tuple[str, ...] = ()) -> Iterator[Tuple[bool, str, bytes]]:
+    # solve_puzzle_file for a packed puzzle file; stored solutions are not consulted.
+    with PackedPuzzleFile(path) as packed_file:
+        count = len(packed_file)
+    yield from iter_solve_file_ranges(solve_packed_file_range, path, count, workers, chunksize, engine, techniques)
+
+def pack_text_file(text_path: str, packed_path: str, solve: bool = False, engine: str = "bits",
+                   workers: Optional[int] = 1) -> int:
+    '''
+    Convert a text puzzle file (one puzzle per line, 0 or . for blanks) to a packed file
+    and return the number of puzzles. With solve, every puzzle that has a solution is
+    stored with it, solved over iter_solve_packed.
+    '''
+    with open(text_path, "rb") as text_file, PackedPuzzleWriter(packed_path) as writer:
+        puzzles = sud.read_puzzle_lines(text_file)
+        if not solve:
+            for puzzle in puzzles:
+                writer.write(puzzle)
+            return writer.count
+        # tee only holds the puzzles that are still being solved.
+        puzzles, to_solve = itertools.tee(puzzles)
+        for puzzle, (is_solved, _, solution) in zip(puzzles, sud.iter_solve_packed(to_solve, workers, engine=engine)):
+            writer.write(puzzle, solution if is_solved else None)
+        return writer.count
+
+def unpack_to_text_file(packed_path: str, text_path: str, solutions: bool = False) -> int:
+    # Convert a packed file back to text, one puzzle per line, or with solutions the
+    # stored solution where there is one. Returns the number of puzzles.
+    count = 0
+    with open(packed_path, "rb") as packed_file, open(text_path, "wb") as text_file:
+        for puzzle, solution in iter_packed_stream(packed_file):
+            text_file.write((solution if solutions and solution is not None else puzzle) + b"\n")
+            count += 1
+    return count
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert between text and packed binary puzzle files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="text puzzle file -> packed file")
+    pack.add_argument("text_path")
+    pack.add_argument("packed_path")
+    pack.add_argument("--solve", action="store_true", help="store the solutions too")
+    pack.add_argument("--engine", choices=sud.ENGINES, default="bits", help="solver backend for --solve (default: bits)")
+    pack.add_argument("--workers", type=int, default=1, help="solver processes for --solve, 0 for one per CPU (default: 1)")
+    unpack = commands.add_parser("unpack", help="packed file -> text puzzle file")
+    unpack.add_argument("packed_path")
+    unpack.add_argument("text_path")
+    unpack.add_argument("--solutions", action="store_true", help="write the stored solutions instead of the puzzles")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "pack":
+            count = pack_text_file(args.text_path, args.packed_path, args.solve, args.engine, args.workers or None)
+        else:
+            count = unpack_to_text_file(args.packed_path, args.text_path, args.solutions)
+    except (OSError, ValueError) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+    print("{} puzzles".format(count))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
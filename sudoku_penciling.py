@@ -1,33 +1,191 @@
 from dataclasses import dataclass
-from typing import List, Set, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple, Optional
+from itertools import combinations
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import math
+import os
 import random
+import sys
+import time
+import sudoku_dlx
+
+np = None # numpy once load_numpy() has imported it, see "Vectorized propagation"
 
 @dataclass
 class SolveState:
     board_candidates: List[List[Set[int]]]
     is_finalized: List[List[bool]]
+    # Names from PROPAGATION_TECHNIQUES that winnow applies once naked singles run dry.
+    techniques: Tuple[str, ...] = ()
+    # Number of times those techniques got winnow moving again where solve() would
+    # otherwise have had to guess. Carried over by clone(), so it counts the path to this
+    # state; SolveStats.guesses_avoided counts every branch.
+    guesses_avoided: int = 0
 
     def clone(self):
         board_candidates = [ [ set(cand_set) for cand_set in row] for row in self.board_candidates ]
         is_finalized = [ [ fn for fn in row] for row in self.is_finalized ]
-        return SolveState(board_candidates, is_finalized)
+        return SolveState(board_candidates, is_finalized, self.techniques, self.guesses_avoided)
+
+# Bitmask candidate engine.
+# Each cell's candidates are packed into a 9-bit int (bit v-1 set means v is still
+# a candidate) and the board is a flat list of 81 of them, indexed row * 9 + col.
+# Finalized cells additionally carry FINALIZED_BIT, so the whole state lives in one
+# list and a clone is a single flat copy.
+ALL_CANDIDATES = 0x1FF
+FINALIZED_BIT  = 0x200
+POPCOUNT       = tuple(bin(mask).count("1") for mask in range(ALL_CANDIDATES + 1))
+LOWEST_VALUE   = tuple((mask & -mask).bit_length() for mask in range(ALL_CANDIDATES + 1)) # 0 for the empty mask
+
+@dataclass
+class BitSolveState:
+    cells: List[int]
+
+    def clone(self):
+        return BitSolveState(self.cells[:])
+
+def value_to_bit(value: int) -> int:
+    return 1 << (value - 1)
+
+def get_box_idx(row: int, col: int, box_size: int = 3) -> int:
+    return box_size * (row // box_size) + col // box_size
+
+def make_unit_cells(box_size: int = 3):
+    # Units of a grid with side box_size**2 as flat cell indices: rows, then columns, then boxes.
+    side = box_size * box_size
+    return (tuple(tuple(row * side + col for col in range(side)) for row in range(side)) +
+            tuple(tuple(row * side + col for row in range(side)) for col in range(side)) +
+            tuple(tuple(idx for idx in range(side * side) if get_box_idx(*divmod(idx, side), box_size) == box)
+                  for box in range(side)))
+
+# Cell index tables, built once at import. Cells are numbered idx = row * 9 + col.
+# UNIT_CELLS holds the 27 units (rows 0-8, columns 9-17, boxes 18-26) and PEERS the
+# 20 other cells sharing a unit with each cell, CELL_UNITS the 3 units of each cell. UNITS and PEER_COORDS are the same
+# tables as (row, col) pairs for the 2D SolveState.
+CELL_COORDS = tuple(divmod(idx, 9) for idx in range(81))
+BOX_IDX     = tuple(get_box_idx(row, col) for row, col in CELL_COORDS)
+UNIT_CELLS  = make_unit_cells(3)
+PEERS       = tuple(tuple(sorted((set(UNIT_CELLS[row]) | set(UNIT_CELLS[9 + col]) | set(UNIT_CELLS[18 + BOX_IDX[idx]])) - { idx }))
+                    for idx, (row, col) in enumerate(CELL_COORDS))
+CELL_UNITS  = tuple((row, 9 + col, 18 + BOX_IDX[idx]) for idx, (row, col) in enumerate(CELL_COORDS))
+UNITS       = tuple(tuple(CELL_COORDS[idx] for idx in unit) for unit in UNIT_CELLS)
+LINE_UNITS  = UNITS[:18]
+BOX_UNITS   = UNITS[18:]
+PEER_COORDS = tuple(tuple(CELL_COORDS[peer] for peer in peers) for peers in PEERS)
+
+# Conflict reports.
+# A Conflict names the unit a board breaks the rules in and the cells responsible:
+#   "duplicate"     value occurs at every cell in cells
+#   "blank"         cells are empty (only an error for a board that should be complete)
+#   "out_of_range"  cells hold value, which is not between 1 and the side
+# Units are numbered as in UNIT_CELLS, so a unit's kind and index follow from its
+# number; cells are (row, col) pairs, and a unit's cells come in board order.
+UNIT_KINDS = ("row", "column", "box")
+
+@dataclass
+class Conflict:
+    reason: str
+    kind:   str # one of UNIT_KINDS
+    index:  int # 0-based within kind
+    value:  int
+    cells:  Tuple[Tuple[int, int], ...]
+
+    def describe(self) -> str:
+        unit  = "{} {}".format(self.kind, self.index + 1)
+        cells = ", ".join("({}, {})".format(row + 1, col + 1) for row, col in self.cells)
+        if self.reason == "duplicate":
+            return "{} appears {} times in {} at {}".format(self.value, len(self.cells), unit, cells)
+        if self.reason == "blank":
+            return "{} has blank cells at {}".format(unit, cells)
+        return "{} holds {}, which is out of range, at {}".format(unit, self.value, cells)
 
-def get_box_idx(row: int, col: int) -> int:
-    return 3 * (row // 3) + col // 3
+class InvalidBoard(ValueError):
+    # Raised for a board whose clues conflict; conflicts lists every clue out of range or duplicated.
+    def __init__(self, conflicts: List[Conflict]):
+        super().__init__("Invalid initial board: " + "; ".join(conflict.describe() for conflict in conflicts))
+        self.conflicts = conflicts
+
+def unit_positions(values, unit: Tuple[int, ...], side: int = 9) -> Dict[int, List[Tuple[int, int]]]:
+    # Value -> (row, col) of the cells holding it, for one unit of a flat board.
+    positions = {}
+    for idx in unit:
+        positions.setdefault(values[idx], []).append(divmod(idx, side))
+    return positions
+
+def unit_conflict(values, unit_idx: int, unit: Tuple[int, ...], side: int = 9) -> Optional[Conflict]:
+    # First thing wrong with one unit of a complete flat board: blanks, then values out of range, then duplicates.
+    positions = unit_positions(values, unit, side)
+    kind, index = UNIT_KINDS[unit_idx // side], unit_idx % side
+    if 0 in positions:
+        return Conflict("blank", kind, index, 0, tuple(positions[0]))
+    for value, cells in positions.items():
+        if not 0 < value <= side:
+            return Conflict("out_of_range", kind, index, value, tuple(cells))
+    for value, cells in positions.items():
+        if len(cells) > 1:
+            return Conflict("duplicate", kind, index, value, tuple(cells))
+    return None
+
+def board_shape(board) -> int:
+    # Box size of an N^2 x N^2 board, ValueError for anything else.
+    side     = len(board)
+    box_size = math.isqrt(side)
+    if side == 0 or box_size * box_size != side or any(len(row) != side for row in board):
+        raise ValueError("Board is not an N^2 x N^2 grid")
+    return box_size
+
+def first_conflict(board: List[List[int]]) -> Optional[Conflict]:
+    # Why a filled-in board of any N^2 x N^2 size is not a solution, or None if it is.
+    # Units are checked in order, rows first; verify_sudoku prints this instead.
+    box_size = board_shape(board)
+    side     = box_size * box_size
+    values   = [value for row in board for value in row]
+    for unit_idx, unit in enumerate(UNIT_CELLS if side == 9 else make_unit_cells(box_size)):
+        conflict = unit_conflict(values, unit_idx, unit, side)
+        if conflict is not None:
+            return conflict
+    return None
+
+def find_conflicts(board: List[List[int]]) -> List[Conflict]:
+    # Every value outside 0..side (by row) and every value given more than once in a unit,
+    # of a partly filled board of any N^2 x N^2 size.
+    try:
+        box_size = board_shape(board)
+    except ValueError:
+        return []
+    side      = box_size * box_size
+    values    = [value for row in board for value in row]
+    conflicts = []
+    for row_idx, row in enumerate(board):
+        for value in sorted(set(row)):
+            if not 0 <= value <= side:
+                conflicts.append(Conflict("out_of_range", "row", row_idx, value,
+                                          tuple((row_idx, col) for col, cur in enumerate(row) if cur == value)))
+    for unit_idx, unit in enumerate(UNIT_CELLS if side == 9 else make_unit_cells(box_size)):
+        for value, cells in sorted(unit_positions(values, unit, side).items()):
+            if 0 < value <= side and len(cells) > 1:
+                conflicts.append(Conflict("duplicate", UNIT_KINDS[unit_idx // side], unit_idx % side, value, tuple(cells)))
+    return conflicts
 
 def init_group_sets(board: List[List[int]]):
+    # Values present in every row, column and box. Raises InvalidBoard if a clue is not
+    # between 1 and 9 or clues conflict, so every engine rejects the same boards.
     row_sets = [set() for i in range(9)]
     col_sets = [set() for i in range(9)]
     box_sets = [set() for i in range(9)]
-    for row in range(9):
-        for col in range(9):
-            cur_cell = board[row][col]
-            if cur_cell == 0:
-                continue
-            for group_set in [ row_sets[row], col_sets[col], box_sets[get_box_idx(row, col)]]:
-                if cur_cell in group_set:
-                    raise Exception("Invalid initial board")
-                group_set.add(cur_cell)
+    for idx, (row, col) in enumerate(CELL_COORDS):
+        cur_cell = board[row][col]
+        if cur_cell == 0:
+            continue
+        if not 0 < cur_cell <= 9:
+            raise InvalidBoard(find_conflicts(board))
+        for group_set in [ row_sets[row], col_sets[col], box_sets[BOX_IDX[idx]]]:
+            if cur_cell in group_set:
+                # Only invalid boards pay for the full report.
+                raise InvalidBoard(find_conflicts(board))
+            group_set.add(cur_cell)
 
     return row_sets, col_sets, box_sets
 
@@ -35,28 +193,166 @@ def init_board_candidates(board, row_sets, col_sets, box_sets):
     board_candidates = [ [None for col in range(9)] for row in range(9)]
     is_finalized     = [ [False for col in range(9)] for row in range(9)]
 
-    for row in range(9):
-        for col in range(9):
-            # Simple case: board has this already defined.
-            cur_entry = board[row][col]
-            if cur_entry != 0:
-                board_candidates[row][col] = { cur_entry }
-                is_finalized[row][col]     = True
-            else:
-                board_candidates[row][col] = get_candidates([
-                    row_sets[row], col_sets[col], box_sets[get_box_idx(row, col)] ])
-                is_finalized[row][col]     = False # Set to false even if there's only one candidate.
+    for idx, (row, col) in enumerate(CELL_COORDS):
+        # Simple case: board has this already defined.
+        cur_entry = board[row][col]
+        if cur_entry != 0:
+            board_candidates[row][col] = { cur_entry }
+            is_finalized[row][col]     = True
+        else:
+            board_candidates[row][col] = get_candidates([
+                row_sets[row], col_sets[col], box_sets[BOX_IDX[idx]] ])
+            is_finalized[row][col]     = False # Set to false even if there's only one candidate.
     
     return board_candidates, is_finalized
 
-def get_candidates(cand_sets: List[Set[int]]):
-    candidates = set(map(int, range(1, 10)))
+def init_bit_candidates(board, row_sets, col_sets, box_sets) -> BitSolveState:
+    # Same as init_board_candidates, but packs every cell into a bitmask.
+    row_masks = [sum(map(value_to_bit, group_set)) for group_set in row_sets]
+    col_masks = [sum(map(value_to_bit, group_set)) for group_set in col_sets]
+    box_masks = [sum(map(value_to_bit, group_set)) for group_set in box_sets]
+    cells = [0] * 81
+
+    for idx, (row, col) in enumerate(CELL_COORDS):
+        cur_entry = board[row][col]
+        if cur_entry != 0:
+            cells[idx] = value_to_bit(cur_entry) | FINALIZED_BIT
+        else:
+            cells[idx] = ALL_CANDIDATES & ~(row_masks[row] | col_masks[col] | box_masks[BOX_IDX[idx]])
+
+    return BitSolveState(cells)
+
+def init_bit_candidates_packed(puzzle) -> BitSolveState:
+    '''
+    Build a BitSolveState straight from a packed puzzle (81 ASCII digits, b"0" or b"."
+    for blanks, see board_to_bytes), so no 2D board is needed. puzzle can be any
+    bytes-like object. Raises ValueError if it is malformed and InvalidBoard, like
+    init_group_sets, if its clues conflict.
+    '''
+    if len(puzzle) != 81:
+        raise ValueError("Packed puzzle must be 81 bytes, got {}".format(len(puzzle)))
+    unit_masks = [0] * 27
+    cells      = [0] * 81
+    for idx in range(81):
+        ch = puzzle[idx]
+        if ch == 48 or ch == 46:
+            continue
+        if ch < 49 or ch > 57:
+            raise ValueError("Packed puzzle may only contain digits and '.'")
+        cur_bit = 1 << (ch - 49)
+        for unit in CELL_UNITS[idx]:
+            if unit_masks[unit] & cur_bit:
+                raise InvalidBoard(find_conflicts(bytes_to_board(puzzle)))
+            unit_masks[unit] |= cur_bit
+        cells[idx] = cur_bit | FINALIZED_BIT
+
+    for idx in range(81):
+        if cells[idx] == 0:
+            row, col, box = CELL_UNITS[idx]
+            cells[idx] = ALL_CANDIDATES & ~(unit_masks[row] | unit_masks[col] | unit_masks[box])
+    return BitSolveState(cells)
+
+def get_candidates(cand_sets: List[Set[int]], side: int = 9):
+    candidates = set(map(int, range(1, side + 1)))
     for cand_set in cand_sets:
         candidates = candidates - cand_set
     return candidates
 
-def solve(state: SolveState) -> Optional[SolveState]:
-    debug = False
+# Search budget.
+# A degenerate board can keep the search busy for a very long time, so the solvers
+# take an optional SolveBudget and charge it once per search node. Once it runs out
+# charge() raises SolveTimeout, which unwinds the whole search; solve_board turns that
+# into the "timeout" status and leaves the caller's board untouched.
+class SolveTimeout(Exception):
+    pass
+
+@dataclass
+class SolveBudget:
+    max_nodes: Optional[int]   = None # search nodes (winnow calls or DLX branches) allowed
+    deadline:  Optional[float] = None # time.monotonic() value to give up at
+    cancel:    Optional[object] = None # anything with is_set(), e.g. a threading.Event
+    nodes:     int = 0
+
+    def charge(self) -> None:
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SolveTimeout("Node limit of {} reached".format(self.max_nodes))
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SolveTimeout("Deadline reached")
+        if self.cancel is not None and self.cancel.is_set():
+            raise SolveTimeout("Cancelled")
+
+def make_budget(max_nodes: Optional[int] = None, deadline: Optional[float] = None, cancel=None) -> Optional[SolveBudget]:
+    # None when there is nothing to enforce, so unbounded solves skip the bookkeeping.
+    if max_nodes is None and deadline is None and cancel is None:
+        return None
+    return SolveBudget(max_nodes, deadline, cancel)
+
+# Solver statistics.
+# Passing a SolveStats to solve_board (sets and bits engines) fills in what the search
+# did, and calls on_guess / on_backtrack with (row, col, value, depth) and on_finalize
+# with (row, col, value) as it happens. Everything is counted per winnow call or per
+# guess, never inside winnow's loops, and the solvers only look at stats when it is
+# not None, so leaving it out costs nothing.
+@dataclass
+class SolveStats:
+    winnow_passes:   int   = 0
+    eliminations:    int   = 0   # candidates removed by winnow, not counting guesses
+    finalized:       int   = 0   # cells finalized by winnow
+    guesses:         int   = 0
+    backtracks:      int   = 0   # guesses undone, because they failed or to look for more solutions
+    guesses_avoided: int   = 0   # times techniques got winnow going again instead of a guess, see SolveState
+    max_depth:       int   = 0   # most guesses on one search path
+    clones:          int   = 0   # SolveState copies; the bits engine undoes on a trail instead
+    winnow_time:     float = 0.0 # seconds in winnow, the rest of total_time is the search itself
+    total_time:      float = 0.0
+    on_guess:        Optional[Callable[[int, int, int, int], None]] = None
+    on_backtrack:    Optional[Callable[[int, int, int, int], None]] = None
+    on_finalize:     Optional[Callable[[int, int, int], None]] = None
+    depth:           int   = 0   # guesses on the current search path
+
+    @property
+    def search_time(self) -> float:
+        return self.total_time - self.winnow_time
+
+    def guess(self, row: int, col: int, value: int) -> None:
+        self.guesses += 1
+        self.depth   += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if self.on_guess is not None:
+            self.on_guess(row, col, value, self.depth)
+
+    def backtrack(self, row: int, col: int, value: int) -> None:
+        self.backtracks += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(row, col, value, self.depth)
+        self.depth -= 1
+
+    def as_dict(self) -> Dict[str, float]:
+        counters = ("winnow_passes", "eliminations", "finalized", "guesses", "backtracks", "guesses_avoided",
+                    "max_depth", "clones", "winnow_time", "total_time", "search_time")
+        return { name: getattr(self, name) for name in counters }
+
+def winnow_with_stats(state: SolveState, stats: SolveStats) -> Tuple[bool, int]:
+    # winnow, counting its effect by comparing the state before and after.
+    before_counts    = [len(candidates) for row in state.board_candidates for candidates in row]
+    before_finalized = [is_finalized for row in state.is_finalized for is_finalized in row]
+    before_avoided   = state.guesses_avoided
+    start = time.perf_counter()
+    is_valid, return_code = winnow(state)
+    stats.winnow_time     += time.perf_counter() - start
+    stats.winnow_passes   += 1
+    stats.guesses_avoided += state.guesses_avoided - before_avoided
+    for idx, (row, col) in enumerate(CELL_COORDS):
+        candidates = state.board_candidates[row][col]
+        stats.eliminations += before_counts[idx] - len(candidates)
+        if state.is_finalized[row][col] and not before_finalized[idx]:
+            stats.finalized += 1
+            if stats.on_finalize is not None and len(candidates) == 1:
+                stats.on_finalize(row, col, next(iter(candidates)))
+    return is_valid, return_code
+
+def solve(state: SolveState, budget: Optional[SolveBudget] = None, stats: Optional[SolveStats] = None) -> Optional[SolveState]:
     # Level 2 solve algorithm: 
     # apply the winnow algorithm to remove deterministic candidates. 
     # then, select the cell with the smallest number of remaining candidates.
@@ -65,10 +361,14 @@ def solve(state: SolveState) -> Optional[SolveState]:
     # Return that solution up the chain.
     # If the guess is incorrect, change your guess and repeat until you find the correct
     # value.
-    is_valid, return_code = winnow(state)
-    if debug:
-        print("winnow return: ", return_code)
-        #print_board(state)
+    # budget, if given, is charged once per call; see SolveBudget. stats, if given, is
+    # filled in as described at SolveStats.
+    if budget is not None:
+        budget.charge()
+    if stats is None:
+        is_valid, return_code = winnow(state)
+    else:
+        is_valid, return_code = winnow_with_stats(state, stats)
     if not is_valid:
         return None
 
@@ -94,13 +394,19 @@ def solve(state: SolveState) -> Optional[SolveState]:
     assert min_candidate_cell != None
     min_cand_row, min_cand_col = min_candidate_cell
 
-    for candidate_val in state.board_candidates[min_cand_row][min_cand_col]:
+    # Guess in ascending order so every engine explores (and returns) the same solution first.
+    for candidate_val in sorted(state.board_candidates[min_cand_row][min_cand_col]):
         # Duplicate the solve state and re-apply the winnow algorithm.
         guess_state = state.clone()
         guess_state.board_candidates[min_cand_row][min_cand_col] = { candidate_val }
-        maybe_solved_state = solve(guess_state)
+        if stats is not None:
+            stats.clones += 1
+            stats.guess(min_cand_row, min_cand_col, candidate_val)
+        maybe_solved_state = solve(guess_state, budget, stats)
         if maybe_solved_state:
             return maybe_solved_state
+        if stats is not None:
+            stats.backtrack(min_cand_row, min_cand_col, candidate_val)
 
     # If we reach this state the board is invalid
     return None
@@ -118,40 +424,259 @@ def winnow(state: SolveState) -> Tuple[bool, int]:
     # Return True if the board remains in a valid state after winnowing, otherwise
     # return False. If this returns False, the winnowing process ends and the board
     # will be in an inconsistent state.
+    # If state.techniques is set, whenever the queue runs dry the techniques are tried
+    # in order, restarting from the first after any of them makes progress, and the
+    # queue is drained again. winnow only stops once none of them can do anything.
     single_candidate_cells = []
     for r in range(9):
         for c in range(9):
             if not state.is_finalized[r][c] and len(state.board_candidates[r][c]) == 1:
                single_candidate_cells.append((r, c))
 
-    while len(single_candidate_cells) > 0:
-        cur_row, cur_col = single_candidate_cells.pop()
-        assert len(state.board_candidates[cur_row][cur_col]) == 1
-        cur_val = next(iter(state.board_candidates[cur_row][cur_col]))
+    while True:
+        while len(single_candidate_cells) > 0:
+            cur_row, cur_col = single_candidate_cells.pop()
+            assert len(state.board_candidates[cur_row][cur_col]) == 1
+            cur_val = next(iter(state.board_candidates[cur_row][cur_col]))
 
-        state.is_finalized[cur_row][cur_col] = True
+            state.is_finalized[cur_row][cur_col] = True
 
-        # Remove cur_val as a candidate everywhere.
-        # Remove from everything in this row
-        for col in range(9):
-            if state.is_finalized[cur_row][col]:
-                continue
-            if not maybe_remove_candidate_and_enqueue(cur_val, cur_row, col, state, single_candidate_cells):
-                return False, 1
-        
-        # Remove from everything in this col
-        for row in range(9):
-            if state.is_finalized[row][cur_col]:
-                continue
-            if not maybe_remove_candidate_and_enqueue(cur_val, row, cur_col, state, single_candidate_cells):
-                return False, 2
+            # Remove cur_val as a candidate from every cell in the same row, column and box.
+            for row, col in PEER_COORDS[cur_row * 9 + cur_col]:
+                if state.is_finalized[row][col]:
+                    continue
+                if not maybe_remove_candidate_and_enqueue(cur_val, row, col, state, single_candidate_cells):
+                    return False, 1
 
-        # Remove from everything in this box
-        for row, col in get_box_coords(cur_row, cur_col):
-            if state.is_finalized[row][col]:
-                continue
-            if not maybe_remove_candidate_and_enqueue(cur_val, row, col, state, single_candidate_cells):
-                return False, 3
+        # Naked singles are exhausted. Eliminations alone don't count as an avoided
+        # guess; only getting a new single into the queue does.
+        made_progress = True
+        while made_progress and len(single_candidate_cells) == 0:
+            made_progress = False
+            for technique in state.techniques:
+                is_valid, made_progress = PROPAGATION_TECHNIQUES[technique](state, single_candidate_cells)
+                if not is_valid:
+                    return False, 5
+                if made_progress:
+                    break
+        if len(single_candidate_cells) == 0:
+            break
+        state.guesses_avoided += 1
+
+    return True, 4
+
+def search_bits(state: BitSolveState, limit: int, budget: Optional[SolveBudget] = None,
+                stats: Optional[SolveStats] = None) -> Tuple[int, Optional[List[int]]]:
+    '''
+    Same search as solve(), on a BitSolveState, but iterative and without clones. Each
+    winnow_bits call records the masks it overwrites on a shared undo trail, and a
+    frame on the explicit stack remembers the trail length before its guess, so
+    backtracking just restores masks until the trail is back to that length.
+    Returns (number of solutions found, stopping at limit; cells of the first one).
+    state is left in the last position searched. stats works as for solve().
+    '''
+    cells = state.cells
+    trail = [] # (idx, previous mask) pairs, in the order they were overwritten
+    stack = [] # search frames, see next_branch
+    count    = 0
+    solution = None
+    on_backtrack = None
+    if stats is not None:
+        on_backtrack = lambda frame: stats.backtrack(*CELL_COORDS[frame[1]], LOWEST_VALUE[frame[3]])
+    while True:
+        if budget is not None:
+            budget.charge()
+        if stats is None:
+            is_valid, return_code = winnow_bits(state, trail)
+        else:
+            is_valid, return_code = winnow_bits_with_stats(state, trail, stats)
+        if is_valid:
+            guess_idx = pick_guess_cell(cells)
+            if guess_idx >= 0:
+                stack.append([len(trail), guess_idx, cells[guess_idx], 0])
+            else:
+                # Every cell carries FINALIZED_BIT, so the board is solved.
+                count += 1
+                if solution is None:
+                    solution = cells[:]
+                if count >= limit:
+                    return count, solution
+
+        guess_idx = next_branch(cells, trail, stack, on_backtrack)
+        if guess_idx < 0:
+            return count, solution
+        if stats is not None:
+            stats.guess(*CELL_COORDS[guess_idx], LOWEST_VALUE[stack[-1][3]])
+
+# Search helpers shared by search_bits, trace_bits and sudoku_grid.search_grid. They
+# work on flat lists of candidate masks undone through a trail of (idx, previous
+# mask) pairs, and a search frame is [trail length before the guess, guessed idx,
+# candidate bits not tried yet, bit being tried (0 before the first)].
+def pick_guess_cell(cells: List[int], finalized_bit: int = FINALIZED_BIT, popcount=POPCOUNT.__getitem__) -> int:
+    # The first open cell with the fewest candidates, or -1 if every cell is finalized.
+    # Right after a winnow no open cell has fewer than 2, so one with 2 ends the scan.
+    min_candidate_idx = -1
+    min_candidates    = finalized_bit
+    for idx, cur_mask in enumerate(cells):
+        if cur_mask < finalized_bit:
+            num_candidates = popcount(cur_mask)
+            if num_candidates < min_candidates:
+                min_candidates    = num_candidates
+                min_candidate_idx = idx
+                if num_candidates == 2:
+                    break
+    return min_candidate_idx
+
+def undo_trail(cells: List[int], trail: List[Tuple[int, int]], mark: int) -> None:
+    # Restore the masks overwritten since the trail had length mark.
+    while len(trail) > mark:
+        idx, prev_mask = trail.pop()
+        cells[idx] = prev_mask
+
+def next_branch(cells: List[int], trail: List[Tuple[int, int]], stack: List[list], on_backtrack=None) -> int:
+    '''
+    Backtrack to the innermost guess with candidates left and try the lowest one:
+    undoes the trail to each frame's mark, drops frames with nothing left to try and
+    records the new guess on the trail. Returns the guessed idx, or -1 once the stack is
+    empty. on_backtrack(frame) is called for every guess taken back, before its undo.
+    '''
+    while stack:
+        frame = stack[-1]
+        mark, guess_idx, remaining, tried_bit = frame
+        if tried_bit and on_backtrack is not None:
+            on_backtrack(frame)
+        undo_trail(cells, trail, mark)
+        if remaining:
+            candidate_bit = remaining & -remaining
+            frame[2] = remaining ^ candidate_bit
+            frame[3] = candidate_bit
+            trail.append((guess_idx, cells[guess_idx]))
+            cells[guess_idx] = candidate_bit
+            return guess_idx
+        stack.pop()
+    return -1
+
+def solve_bits(state: BitSolveState, budget: Optional[SolveBudget] = None,
+               stats: Optional[SolveStats] = None) -> Optional[BitSolveState]:
+    # Solve with search_bits; returns the solved state or None.
+    count, solution = search_bits(state, 1, budget, stats)
+    return BitSolveState(solution) if solution is not None else None
+
+def count_solutions_bits(state: BitSolveState, limit: int) -> int:
+    # How many solutions search_bits finds, stopping as soon as that reaches limit.
+    return search_bits(state, limit)[0]
+
+# Solve traces.
+# trace_bits runs the same search as solve_bits but yields a TraceEvent for every
+# change it makes, as it makes it, so a caller can replay the solve one step at a
+# time. Events are produced per winnow pass from that pass's trail entries, like
+# winnow_bits_with_stats counts them, so nothing is kept beyond the trail the search
+# needs anyway and an abandoned trace just stops where it was.
+TRACE_EVENTS = ("finalize", "eliminate", "guess", "backtrack")
+
+@dataclass
+class TraceEvent:
+    kind:   str # one of TRACE_EVENTS
+    row:    int
+    col:    int
+    value:  int # value finalized, eliminated, guessed, or whose guess is undone
+    depth:  int # guesses on the search path when it happened
+    undone: Tuple[Tuple[int, int], ...] = () # backtrack only: cells no longer finalized
+
+def trace_bits(state: BitSolveState, budget: Optional[SolveBudget] = None) -> Iterator[TraceEvent]:
+    '''
+    Generator version of solve_bits: yields TraceEvents as the search goes and returns
+    the cells of the solution, or None if there is none. A backtrack event lists every
+    cell whose value it takes back, the guessed cell included, so replaying the events
+    in order always shows the board the search is on. state is left in the last
+    position searched.
+    '''
+    cells = state.cells
+    trail = []
+    stack = []
+    backtracks = [] # events of the guesses next_branch takes back, at most one per frame
+
+    def on_backtrack(frame) -> None:
+        # Cells finalized since the guess; elimination entries never leave a cell finalized.
+        undone = tuple(CELL_COORDS[idx] for idx, prev_mask in trail[frame[0]:]
+                       if cells[idx] >= FINALIZED_BIT and prev_mask < FINALIZED_BIT and POPCOUNT[prev_mask] == 1)
+        backtracks.append(TraceEvent("backtrack", *CELL_COORDS[frame[1]], LOWEST_VALUE[frame[3]], len(stack), undone))
+
+    while True:
+        if budget is not None:
+            budget.charge()
+        mark = len(trail)
+        is_valid, return_code = winnow_bits(state, trail)
+        cur_bit = 0
+        for idx, prev_mask in trail[mark:]:
+            if POPCOUNT[prev_mask & ALL_CANDIDATES] == 1 and cells[idx] & FINALIZED_BIT:
+                cur_bit = prev_mask
+                yield TraceEvent("finalize", *CELL_COORDS[idx], LOWEST_VALUE[prev_mask], len(stack))
+            else:
+                # winnow_bits records a finalized cell, then every peer it takes that value from.
+                yield TraceEvent("eliminate", *CELL_COORDS[idx], LOWEST_VALUE[cur_bit], len(stack))
+        if is_valid:
+            guess_idx = pick_guess_cell(cells)
+            if guess_idx < 0:
+                return cells[:]
+            stack.append([len(trail), guess_idx, cells[guess_idx], 0])
+
+        guess_idx = next_branch(cells, trail, stack, on_backtrack)
+        yield from backtracks
+        backtracks.clear()
+        if guess_idx < 0:
+            return None
+        yield TraceEvent("guess", *CELL_COORDS[guess_idx], LOWEST_VALUE[stack[-1][3]], len(stack))
+
+def trace_solve(board: List[List[int]], budget: Optional[SolveBudget] = None) -> Iterator[TraceEvent]:
+    # trace_bits from a board; raises InvalidBoard on the first next() if clues conflict.
+    row_sets, col_sets, box_sets = init_group_sets(board)
+    return (yield from trace_bits(init_bit_candidates(board, row_sets, col_sets, box_sets), budget))
+
+def winnow_bits_with_stats(state: BitSolveState, trail: List[Tuple[int, int]], stats: SolveStats) -> Tuple[bool, int]:
+    # winnow_bits, counting its effect from the trail entries it adds: an entry whose
+    # previous mask had one candidate is a finalized cell, any other an elimination.
+    mark  = len(trail)
+    start = time.perf_counter()
+    is_valid, return_code = winnow_bits(state, trail)
+    stats.winnow_time   += time.perf_counter() - start
+    stats.winnow_passes += 1
+    for idx, prev_mask in trail[mark:]:
+        if POPCOUNT[prev_mask & ALL_CANDIDATES] == 1 and state.cells[idx] & FINALIZED_BIT:
+            stats.finalized += 1
+            if stats.on_finalize is not None:
+                stats.on_finalize(*CELL_COORDS[idx], LOWEST_VALUE[prev_mask])
+        else:
+            stats.eliminations += 1
+    return is_valid, return_code
+
+def winnow_bits(state: BitSolveState, trail: Optional[List[Tuple[int, int]]] = None) -> Tuple[bool, int]:
+    # Same algorithm as winnow() without the techniques, on a BitSolveState.
+    # If trail is given, (idx, previous mask) is appended to it for every mask changed.
+    cells = state.cells
+    record = trail.append if trail is not None else None
+    single_candidate_cells = [idx for idx in range(81) if cells[idx] < FINALIZED_BIT and POPCOUNT[cells[idx]] == 1]
+
+    while len(single_candidate_cells) > 0:
+        cur_idx = single_candidate_cells.pop()
+        cur_bit = cells[cur_idx]
+        assert POPCOUNT[cur_bit] == 1
+        if record:
+            record((cur_idx, cur_bit))
+        cells[cur_idx] = cur_bit | FINALIZED_BIT
+
+        # Remove cur_bit from every peer, skipping finalized cells.
+        for peer in PEERS[cur_idx]:
+            peer_mask = cells[peer]
+            if peer_mask & cur_bit and peer_mask < FINALIZED_BIT:
+                if record:
+                    record((peer, peer_mask))
+                peer_mask ^= cur_bit
+                cells[peer] = peer_mask
+                if peer_mask == 0:
+                    return False, 1
+                if POPCOUNT[peer_mask] == 1:
+                    single_candidate_cells.append(peer)
 
     return True, 4
 
@@ -172,13 +697,236 @@ def maybe_remove_candidate_and_enqueue(cur_val: int, row: int, col: int,
             return False
     return True
 
-def get_box_coords(row: int, col: int):
-    base_row = 3 * (row // 3) # 0, 3, 6
-    base_col = 3 * (col // 3) # 0, 3, 6
-    for r in range(base_row, base_row+3):
-        for c in range(base_col, base_col+3):
+def get_box_coords(row: int, col: int, box_size: int = 3):
+    base_row = box_size * (row // box_size) # 0, 3, 6 for box_size 3
+    base_col = box_size * (col // box_size)
+    for r in range(base_row, base_row+box_size):
+        for c in range(base_col, base_col+box_size):
             yield r, c
 
+# Propagation techniques. Each one takes (state, single_candidate_cells), removes
+# candidates from non-finalized cells, enqueues any cell left with one candidate
+# and returns (is_valid, made_progress).
+def get_unit_positions(state: SolveState, unit) -> dict:
+    # Map each digit not yet placed in the unit to the non-finalized cells that still allow it.
+    placed    = set()
+    positions = {}
+    for row, col in unit:
+        if state.is_finalized[row][col]:
+            placed |= state.board_candidates[row][col]
+        else:
+            for value in state.board_candidates[row][col]:
+                positions.setdefault(value, []).append((row, col))
+    for value in range(1, 10):
+        if value not in placed and value not in positions:
+            positions[value] = []
+    return positions
+
+def restrict_cell(state: SolveState, row: int, col: int, allowed: Set[int],
+                  single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # Drop every candidate of a non-finalized cell that is not in allowed.
+    cur_candidates = state.board_candidates[row][col]
+    if cur_candidates <= allowed:
+        return True, False
+    was_single = len(cur_candidates) == 1
+    cur_candidates &= allowed
+    if len(cur_candidates) == 0:
+        return False, True
+    if len(cur_candidates) == 1 and not was_single:
+        single_candidate_cells.append((row, col))
+    return True, True
+
+def apply_hidden_singles(state: SolveState, single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # A digit that fits in only one cell of a unit goes there.
+    made_progress = False
+    for unit in UNITS:
+        for value, cells in get_unit_positions(state, unit).items():
+            if len(cells) == 0:
+                return False, made_progress
+            if len(cells) == 1:
+                row, col = cells[0]
+                is_valid, changed = restrict_cell(state, row, col, { value }, single_candidate_cells)
+                if not is_valid:
+                    return False, True
+                made_progress |= changed
+    return True, made_progress
+
+def apply_naked_subsets(size: int, state: SolveState, single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # size cells of a unit that share only size candidates between them own those
+    # candidates; remove them from the rest of the unit.
+    made_progress = False
+    for unit in UNITS:
+        open_cells = [(row, col) for row, col in unit if not state.is_finalized[row][col]]
+        small_cells = [cell for cell in open_cells if len(state.board_candidates[cell[0]][cell[1]]) <= size]
+        for subset in combinations(small_cells, size):
+            values = set().union(*(state.board_candidates[row][col] for row, col in subset))
+            if len(values) < size:
+                return False, made_progress
+            if len(values) > size:
+                continue
+            for row, col in open_cells:
+                if (row, col) in subset or state.is_finalized[row][col]:
+                    continue
+                is_valid, changed = restrict_cell(state, row, col, state.board_candidates[row][col] - values,
+                                                  single_candidate_cells)
+                if not is_valid:
+                    return False, True
+                made_progress |= changed
+    return True, made_progress
+
+def apply_hidden_subsets(size: int, state: SolveState, single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # size digits of a unit confined to the same size cells fill those cells; remove
+    # every other candidate from them.
+    made_progress = False
+    for unit in UNITS:
+        positions = get_unit_positions(state, unit)
+        small_values = [value for value, cells in positions.items() if 2 <= len(cells) <= size]
+        for subset in combinations(small_values, size):
+            cells = set().union(*(positions[value] for value in subset))
+            if len(cells) < size:
+                return False, made_progress
+            if len(cells) > size:
+                continue
+            for row, col in cells:
+                if state.is_finalized[row][col]:
+                    continue
+                is_valid, changed = restrict_cell(state, row, col, set(subset), single_candidate_cells)
+                if not is_valid:
+                    return False, True
+                made_progress |= changed
+    return True, made_progress
+
+def apply_intersections(from_units, to_units, state: SolveState,
+                        single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # If a digit's cells in a from_unit all lie inside one to_unit, the digit can be
+    # removed from the rest of that to_unit.
+    made_progress = False
+    for from_unit in from_units:
+        for value, cells in get_unit_positions(state, from_unit).items():
+            if len(cells) < 2:
+                continue
+            for to_unit in to_units:
+                if not all(cell in to_unit for cell in cells):
+                    continue
+                for row, col in to_unit:
+                    if (row, col) in cells or state.is_finalized[row][col]:
+                        continue
+                    if value in state.board_candidates[row][col]:
+                        if not maybe_remove_candidate_and_enqueue(value, row, col, state, single_candidate_cells):
+                            return False, True
+                        made_progress = True
+    return True, made_progress
+
+def apply_naked_pairs(state, single_candidate_cells):
+    return apply_naked_subsets(2, state, single_candidate_cells)
+
+def apply_hidden_pairs(state, single_candidate_cells):
+    return apply_hidden_subsets(2, state, single_candidate_cells)
+
+def apply_naked_triples(state, single_candidate_cells):
+    return apply_naked_subsets(3, state, single_candidate_cells)
+
+def apply_hidden_triples(state, single_candidate_cells):
+    return apply_hidden_subsets(3, state, single_candidate_cells)
+
+def apply_pointing(state, single_candidate_cells):
+    # Pointing pairs/triples: box -> row or column.
+    return apply_intersections(BOX_UNITS, LINE_UNITS, state, single_candidate_cells)
+
+def apply_box_line_reduction(state, single_candidate_cells):
+    # Box/line reduction: row or column -> box.
+    return apply_intersections(LINE_UNITS, BOX_UNITS, state, single_candidate_cells)
+
+def apply_fish(size: int, state: SolveState, single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # X-Wing (size 2) and Swordfish (size 3): if a digit's cells in size rows all fall
+    # in the same size columns, the digit can be removed from the rest of those
+    # columns, and the same with rows and columns swapped.
+    made_progress = False
+    for base_units, cover_units, cross_of in ((UNITS[:9], UNITS[9:18], 1), (UNITS[9:18], UNITS[:9], 0)):
+        # Removing one digit leaves the positions of the others alone, so once per line will do.
+        unit_positions = [get_unit_positions(state, unit) for unit in base_units]
+        for value in range(1, 10):
+            base_lines = []
+            for base_idx, positions in enumerate(unit_positions):
+                cells = positions.get(value)
+                if cells is not None and 2 <= len(cells) <= size:
+                    base_lines.append((base_idx, { cell[cross_of] for cell in cells }))
+            for subset in combinations(base_lines, size):
+                crosses = set().union(*(crosses for base_idx, crosses in subset))
+                if len(crosses) < size:
+                    return False, made_progress
+                if len(crosses) > size:
+                    continue
+                base_idxs = { base_idx for base_idx, crosses in subset }
+                for cross in crosses:
+                    for row, col in cover_units[cross]:
+                        if (col if cross_of == 0 else row) in base_idxs or state.is_finalized[row][col]:
+                            continue
+                        if value in state.board_candidates[row][col]:
+                            if not maybe_remove_candidate_and_enqueue(value, row, col, state, single_candidate_cells):
+                                return False, True
+                            made_progress = True
+    return True, made_progress
+
+def apply_xy_wing(state: SolveState, single_candidate_cells: List[Tuple[int, int]]) -> Tuple[bool, bool]:
+    # XY-Wing: a pivot {x, y} that sees pincers {x, z} and {y, z}. Whichever value the
+    # pivot takes, one pincer is z, so z goes from every cell that sees both pincers.
+    made_progress = False
+    bivalue = [idx for idx, (row, col) in enumerate(CELL_COORDS)
+               if not state.is_finalized[row][col] and len(state.board_candidates[row][col]) == 2]
+    bivalue_set = set(bivalue)
+    for pivot in bivalue:
+        pivot_row, pivot_col = CELL_COORDS[pivot]
+        pivot_values = state.board_candidates[pivot_row][pivot_col]
+        if len(pivot_values) != 2:
+            continue
+        x, y = pivot_values
+        pincers = [peer for peer in PEERS[pivot] if peer in bivalue_set]
+        for pincer_x, pincer_y in combinations(pincers, 2):
+            x_values = state.board_candidates[CELL_COORDS[pincer_x][0]][CELL_COORDS[pincer_x][1]]
+            y_values = state.board_candidates[CELL_COORDS[pincer_y][0]][CELL_COORDS[pincer_y][1]]
+            if len(x_values) != 2 or len(y_values) != 2:
+                continue
+            if y in x_values:
+                x_values, y_values = y_values, x_values
+                pincer_x, pincer_y = pincer_y, pincer_x
+            if x not in x_values or y not in y_values:
+                continue
+            z_values = (x_values - { x }) & (y_values - { y })
+            if len(z_values) != 1:
+                continue
+            z = next(iter(z_values))
+            for idx in set(PEERS[pincer_x]) & set(PEERS[pincer_y]):
+                row, col = CELL_COORDS[idx]
+                if idx == pivot or state.is_finalized[row][col] or z not in state.board_candidates[row][col]:
+                    continue
+                if not maybe_remove_candidate_and_enqueue(z, row, col, state, single_candidate_cells):
+                    return False, True
+                made_progress = True
+    return True, made_progress
+
+def apply_x_wing(state, single_candidate_cells):
+    return apply_fish(2, state, single_candidate_cells)
+
+def apply_swordfish(state, single_candidate_cells):
+    return apply_fish(3, state, single_candidate_cells)
+
+# Registry of techniques winnow can apply, cheapest first. Add an entry here to plug
+# in a new technique; ALL_TECHNIQUES enables every one of them in this order.
+PROPAGATION_TECHNIQUES = {
+    "hidden_single": apply_hidden_singles,
+    "naked_pair":    apply_naked_pairs,
+    "pointing":      apply_pointing,
+    "box_line":      apply_box_line_reduction,
+    "hidden_pair":   apply_hidden_pairs,
+    "naked_triple":  apply_naked_triples,
+    "hidden_triple": apply_hidden_triples,
+    "x_wing":        apply_x_wing,
+    "swordfish":     apply_swordfish,
+    "xy_wing":       apply_xy_wing,
+}
+ALL_TECHNIQUES = tuple(PROPAGATION_TECHNIQUES)
+
 def print_sudoku(sud) -> None: #print any 9x9 sudoku board in a nicely format
     for row in range(len(sud)):
         if row != 0 and row %3 == 0:
@@ -190,56 +938,138 @@ def print_sudoku(sud) -> None: #print any 9x9 sudoku board in a nicely format
         print()
 
 def verify_sudoku(sud) -> bool: 
-    # Verify if complete state of the sudoku is valid
-    def verifySet(arr) -> bool:
-        st = set(arr)
-        #st.discard(0)
-        arr = [x for x in arr if x != 0]
-        for numb in arr:
-            if 1 > numb or numb > 9:
-                print("Input number out of range 1-9")
-                return False
-        return len(arr) == len(st)
-    
-    # Verifying rule 1:
-    for row in range(len(sud)):
-        if 0 in sud[row]:
-            print("Incomplete board")
-            return False
-        if not verifySet(sud[row]):
-            print("Rule 1 not satisfied")
-            return False
+    # Verify if complete state of the sudoku is valid, printing why not. Any box size
+    # works: a board with side 4, 16 or 25 is checked with the units of that size.
+    # first_conflict and verify_boards report the failing unit instead of printing.
+    try:
+        conflict = first_conflict(sud)
+    except ValueError as e:
+        print(e)
+        return False
+    if conflict is None:
+        return True
+    if conflict.reason == "blank":
+        print("Incomplete board")
+        return False
+    if conflict.reason == "out_of_range":
+        print("Input number out of range 1-{}".format(len(sud)))
+    # Rule 1 covers the row units, rule 2 the column units and rule 3 the box units.
+    print("Rule {} not satisfied".format(1 + UNIT_KINDS.index(conflict.kind)))
+    return False
 
-    # Verifying rule 2:
-    for row in range(len(sud)):
-        coln = []
-        for col in range(len(sud[row])):
-            coln.append(sud[col][row])
-        if not verifySet(coln):
-            print("Rule 2 not satisfied")
-            return False
+ENGINES = ("sets", "bits", "dlx")
 
-    # Verifying Rule 3:
-    for row in range(len(sud)):
-        block = []
-        for col in range(len(sud[row])):
-            block.append(sud[(row // 3)*3 + col // 3][col % 3 + (row % 3) * 3])
-        if not verifySet(block):
-            print("Rule 3 not satisfied")
-            return False
-              
-    return True
+def solve_sudoku(board: List[List[int]], engine: str = "sets", techniques: Tuple[str, ...] = (),
+                 max_nodes: Optional[int] = None, deadline: Optional[float] = None, cancel=None,
+                 stats: Optional[SolveStats] = None) -> Tuple[bool, str]:
+    # engine selects the solver backend: "sets" (SolveState), "bits" (BitSolveState) or
+    # "dlx" (Dancing Links, see sudoku_dlx). "sets" and "bits" fill in the same solution;
+    # all three agree on the status, but on a board with several solutions "dlx" may
+    # fill in a different one of them.
+    # techniques (names from PROPAGATION_TECHNIQUES, or ALL_TECHNIQUES) are applied by
+    # winnow on the "sets" engine to avoid guesses. They never change the status, but on
+    # a board with several solutions they may also lead to a different one.
+    # max_nodes, deadline (a time.monotonic() value) and cancel (e.g. a threading.Event)
+    # bound the search, see SolveBudget. When any of them runs out the status is
+    # "timeout" and board is left as it was.
+    # stats, a SolveStats, is filled in with what the search did; the "dlx" engine only
+    # records total_time.
+    # Boards of other N^2 x N^2 sizes are solved by sudoku_grid whatever the engine; any
+    # other shape is "invalid".
+    is_solved, msg = solve_board(board, engine, techniques, max_nodes, deadline, cancel, stats)
+    if msg == "invalid":
+        for conflict in find_conflicts(board):
+            print(conflict.describe())
+        print("Invalid board\n")
+    elif msg == "unsolvable":
+        print("Unsolvable sudoku\n")
+    elif msg == "timeout":
+        print("Solve timed out\n")
+    return is_solved, msg
+
+COUNT_ENGINES = ("bits", "dlx")
 
-def solve_sudoku(board: List[List[int]]) -> Tuple[bool, str]:
+def count_solutions(board: List[List[int]], limit: int = 2, engine: str = "bits") -> int:
+    '''
+    Count the solutions of board, stopping as soon as limit of them are found; with
+    the default limit of 2 that is all a uniqueness check needs. Boards with conflicting
+    clues have 0 solutions. The board is not modified. engine is "bits" (the solve_bits
+    search) or "dlx" (Dancing Links, much faster on near-empty boards); boards of other
+    N^2 x N^2 sizes are counted by sudoku_grid and other shapes have 0 solutions.
+    '''
+    if engine not in COUNT_ENGINES:
+        raise ValueError("Unknown engine {}, expected one of {}".format(engine, COUNT_ENGINES))
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    try:
+        box_size = board_shape(board)
+    except (ValueError, TypeError):
+        return 0
+    if box_size != 3:
+        import sudoku_grid # imports this module, so not at the top
+        return sudoku_grid.count_grid_solutions(board, limit)
+    try:
+        row_sets, col_sets, box_sets = init_group_sets(board)
+    except Exception as e:
+        return 0
+    if engine == "dlx":
+        return sudoku_dlx.count_dlx(board, limit)
+    return count_solutions_bits(init_bit_candidates(board, row_sets, col_sets, box_sets), limit)
+
+def has_unique_solution(board: List[List[int]], engine: str = "bits") -> bool:
+    return count_solutions(board, 2, engine) == 1
+
+def check_solver_options(engine: str, techniques: Tuple[str, ...]) -> None:
+    if engine not in ENGINES:
+        raise ValueError("Unknown engine {}, expected one of {}".format(engine, ENGINES))
+    for technique in techniques:
+        if technique not in PROPAGATION_TECHNIQUES:
+            raise ValueError("Unknown technique {}, expected one of {}".format(technique, ALL_TECHNIQUES))
+    if techniques and engine != "sets":
+        raise ValueError("Propagation techniques are only supported by the sets engine")
+
+def solve_board(board: List[List[int]], engine: str = "sets", techniques: Tuple[str, ...] = (),
+                max_nodes: Optional[int] = None, deadline: Optional[float] = None, cancel=None,
+                stats: Optional[SolveStats] = None) -> Tuple[bool, str]:
+    # Same as solve_sudoku, without printing why a board could not be solved.
+    check_solver_options(engine, techniques)
+    return solve_board_budgeted(board, engine, techniques, make_budget(max_nodes, deadline, cancel), stats)
+
+def solve_board_budgeted(board: List[List[int]], engine: str, techniques: Tuple[str, ...],
+                         budget: Optional[SolveBudget], stats: Optional[SolveStats] = None) -> Tuple[bool, str]:
+    # solve_board with a SolveBudget made by the caller, who can read budget.nodes afterwards.
+    start = time.perf_counter()
+    try:
+        box_size = board_shape(board)
+    except (ValueError, TypeError):
+        box_size = 0
+    if box_size == 0:
+        result = (False, "invalid")
+    elif box_size != 3:
+        import sudoku_grid # imports this module, so not at the top
+        result = sudoku_grid.solve_grid_budgeted(board, budget)
+    elif engine == "bits":
+        result = solve_board_bits(board, budget, stats)
+    elif engine == "dlx":
+        result = solve_board_dlx(board, budget)
+    else:
+        result = solve_board_sets(board, techniques, budget, stats)
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
+    return result
+
+def solve_board_sets(board: List[List[int]], techniques: Tuple[str, ...] = (), budget: Optional[SolveBudget] = None,
+                     stats: Optional[SolveStats] = None) -> Tuple[bool, str]:
     # First initialize our solve state
     try:
         row_sets, col_sets, box_sets = init_group_sets(board)
         board_candidates, is_finalized = init_board_candidates(board, row_sets, col_sets, box_sets)
-        state = SolveState(board_candidates, is_finalized)
+        state = SolveState(board_candidates, is_finalized, tuple(techniques))
         # Solve
-        solved_state = solve(state)
+        solved_state = solve(state, budget, stats)
+    except SolveTimeout:
+        return False, "timeout"
     except Exception as e:
-        print("Invalid board\n")
         return False, "invalid"
     
     # Finally copy everything over to the original board and return.
@@ -252,10 +1082,316 @@ def solve_sudoku(board: List[List[int]]) -> Tuple[bool, str]:
                     entry = next(iter(solved_state.board_candidates[row][col]))
                     board[row][col] = entry
             except Exception as e:
-                print("Unsolvable sudoku\n")
                 return False, "unsolvable"
     return True, ""
 
+def solve_board_bits(board: List[List[int]], budget: Optional[SolveBudget] = None,
+                     stats: Optional[SolveStats] = None) -> Tuple[bool, str]:
+    try:
+        row_sets, col_sets, box_sets = init_group_sets(board)
+        state = init_bit_candidates(board, row_sets, col_sets, box_sets)
+        solved_state = solve_bits(state, budget, stats)
+    except SolveTimeout:
+        return False, "timeout"
+    except Exception as e:
+        return False, "invalid"
+
+    if solved_state is None:
+        return False, "unsolvable"
+
+    for row in range(9):
+        for col in range(9):
+            if board[row][col] == 0:
+                board[row][col] = LOWEST_VALUE[solved_state.cells[row * 9 + col] & ALL_CANDIDATES]
+    return True, ""
+
+def solve_board_dlx(board: List[List[int]], budget: Optional[SolveBudget] = None) -> Tuple[bool, str]:
+    try:
+        # Rejects conflicting clues, which the exact cover matrix cannot represent.
+        init_group_sets(board)
+        solution = sudoku_dlx.solve_dlx(board, budget)
+    except SolveTimeout:
+        return False, "timeout"
+    except Exception as e:
+        return False, "invalid"
+
+    if solution is None:
+        return False, "unsolvable"
+
+    for row in range(9):
+        for col in range(9):
+            board[row][col] = solution[row * 9 + col]
+    return True, ""
+
+# Batch solving.
+# Puzzles travel to and from worker processes packed as 81 ASCII digits (row by row,
+# b"0" for a blank) instead of nested lists, which keeps pickling cheap.
+def board_to_bytes(board: List[List[int]]) -> bytes:
+    return bytes(48 + board[row][col] for row, col in CELL_COORDS)
+
+def bytes_to_board(puzzle: bytes) -> List[List[int]]:
+    # Inverse of board_to_bytes. b"." is accepted as a blank too.
+    if len(puzzle) != 81:
+        raise ValueError("Packed puzzle must be 81 bytes, got {}".format(len(puzzle)))
+    values = [0 if ch == 46 else ch - 48 for ch in puzzle]
+    for value in values:
+        if value < 0 or value > 9:
+            raise ValueError("Packed puzzle may only contain digits and '.'")
+    return [values[row * 9: row * 9 + 9] for row in range(9)]
+
+def solve_packed_puzzle(puzzle, engine: str = "sets", techniques: Tuple[str, ...] = ()) -> Tuple[bool, str, bytes]:
+    '''
+    Solve one packed puzzle, given as any bytes-like object (e.g. a memoryview slice
+    of a memory-mapped file). Returns (is_solved, msg, board) like solve_sudoku, where
+    board is the packed solution, or the puzzle as given if it could not be solved.
+    A puzzle that can't be unpacked is reported as invalid. The bits engine works on
+    the packed form directly; the others unpack it into a board first.
+    '''
+    if engine == "bits":
+        try:
+            solved_state = solve_bits(init_bit_candidates_packed(puzzle))
+        except Exception as e:
+            return False, "invalid", bytes(puzzle)
+        if solved_state is None:
+            return False, "unsolvable", bytes(puzzle)
+        return True, "", bytes(48 + LOWEST_VALUE[cur_mask & ALL_CANDIDATES] for cur_mask in solved_state.cells)
+
+    try:
+        board = bytes_to_board(puzzle)
+    except ValueError:
+        return False, "invalid", bytes(puzzle)
+    is_solved, msg = solve_board(board, engine, techniques)
+    return is_solved, msg, board_to_bytes(board) if is_solved else bytes(puzzle)
+
+# Vectorized propagation.
+# With numpy, a chunk of puzzles for the bits engine is held as an (N, 81) uint16 array
+# of candidate masks (no FINALIZED_BIT) and naked singles are eliminated from every
+# board at once: one step ORs each cell's single-candidate peers together through
+# PEER_INDEX and clears those bits. Most puzzles are solved by that alone; only the
+# rest go through search_bits. Naked singles reach the same fixpoint in any order, so
+# the results are exactly those of solve_packed_puzzle.
+# numpy takes several times longer to import than this whole module, so it is only
+# imported, and the tables below built, when a vectorized path first runs.
+numpy_missing = False
+
+def load_numpy() -> bool:
+    # Import numpy and build the lookup tables once; False if numpy is not installed.
+    global np, numpy_missing, PEER_INDEX, POPCOUNT_NP, VALUE_NP, DIGIT_MASK, UNIT_INDEX, VALUE_BIT
+    if np is not None:
+        return True
+    if numpy_missing:
+        return False
+    try:
+        import numpy
+    except ImportError:
+        numpy_missing = True
+        return False
+    PEER_INDEX  = numpy.array(PEERS, dtype=numpy.intp)                  # (81, 20)
+    POPCOUNT_NP = numpy.array(POPCOUNT, dtype=numpy.uint8)
+    VALUE_NP    = numpy.array(LOWEST_VALUE, dtype=numpy.uint8)
+    DIGIT_MASK  = numpy.array([ALL_CANDIDATES] + [1 << digit_idx for digit_idx in range(9)], dtype=numpy.uint16) # by digit, 0 = blank
+    UNIT_INDEX  = numpy.array(UNIT_CELLS, dtype=numpy.intp)             # (27, 9)
+    VALUE_BIT   = numpy.array([0] + [1 << digit_idx for digit_idx in range(9)] + [0], dtype=numpy.uint16) # by value clipped to 0..10
+    np = numpy
+    return True
+
+def require_numpy(name: str) -> None:
+    if not load_numpy():
+        raise ImportError("{} needs numpy".format(name))
+
+def peer_masks_vectorized(masks):
+    # OR of the 20 peer masks of every cell, for an (N, 81) array.
+    return np.bitwise_or.reduce(masks[:, PEER_INDEX], axis=2)
+
+def propagate_vectorized(cells, active) -> None:
+    '''
+    Apply naked singles in place to the boards of cells (an (N, 81) uint16 array) whose
+    entry in the boolean array active is set, until none of them changes. A board that
+    runs into a contradiction has its active entry cleared.
+    '''
+    rows = np.flatnonzero(active)
+    while rows.size:
+        masks     = cells[rows]
+        is_single = POPCOUNT_NP[masks] == 1
+        taken     = peer_masks_vectorized(np.where(is_single, masks, 0))
+        new_masks = np.where(is_single, masks, masks & ~taken)
+        is_dead   = ((new_masks == 0) | (is_single & (masks & taken != 0))).any(axis=1)
+        changed   = (new_masks != masks).any(axis=1)
+        cells[rows] = new_masks
+        active[rows[is_dead]] = False
+        rows = rows[changed & ~is_dead]
+
+def solve_packed_vectorized(puzzles: List[bytes]) -> List[Tuple[bool, str, bytes]]:
+    # Same as solve_packed(puzzles, "bits"), propagating all puzzles at once. Needs numpy.
+    require_numpy("solve_packed_vectorized")
+    results = [(False, "invalid", bytes(puzzle)) for puzzle in puzzles]
+    kept = [idx for idx, puzzle in enumerate(puzzles) if len(puzzle) == 81]
+    if not kept:
+        return results
+    raw = np.frombuffer(b"".join(bytes(puzzles[idx]) for idx in kept), dtype=np.uint8).reshape(-1, 81)
+    for idx, result in zip(kept, solve_records_vectorized(raw)):
+        results[idx] = result
+    return results
+
+def solve_records_vectorized(raw) -> List[Tuple[bool, str, bytes]]:
+    # solve_packed_vectorized for an (N, 81) uint8 array of ASCII puzzles, which may be a
+    # strided view of a memory-mapped file. Needs numpy.
+    require_numpy("solve_records_vectorized")
+    digits = np.where(raw == 46, 48, raw).astype(np.int16) - 48
+    is_malformed = ((digits < 0) | (digits > 9)).any(axis=1)
+    digits[is_malformed] = 0
+    is_clue = digits > 0
+    cells   = DIGIT_MASK[digits]
+    has_conflict = (is_clue & (cells & peer_masks_vectorized(np.where(is_clue, cells, 0)) != 0)).any(axis=1)
+
+    is_valid = ~(is_malformed | has_conflict)
+    active   = is_valid.copy()
+    propagate_vectorized(cells, active)
+    is_solved = active & (POPCOUNT_NP[cells] == 1).all(axis=1)
+    solutions = VALUE_NP[cells] + 48
+
+    results = []
+    for row in range(len(raw)):
+        if is_solved[row]:
+            results.append((True, "", solutions[row].tobytes()))
+        elif active[row]:
+            solved_state = solve_bits(BitSolveState(cells[row].tolist()))
+            if solved_state is None:
+                results.append((False, "unsolvable", raw[row].tobytes()))
+            else:
+                results.append((True, "", bytes(48 + LOWEST_VALUE[cur_mask & ALL_CANDIDATES] for cur_mask in solved_state.cells)))
+        else:
+            results.append((False, "unsolvable" if is_valid[row] else "invalid", raw[row].tobytes()))
+    return results
+
+# Bulk verification.
+# A unit of a solution holds every value once exactly when the OR of its cells' bits
+# is ALL_CANDIDATES: 9 cells can only cover 9 bits if they are all different, and
+# blanks and values out of range contribute no bit. verify_boards_vectorized computes
+# that for all 27 units of every board in one pass, and only looks closer (with
+# unit_conflict, like first_conflict) at the first failing unit of a failing board.
+def verify_boards_vectorized(values) -> List[Optional[Conflict]]:
+    # verify_boards for an (N, 81) integer array. Needs numpy.
+    require_numpy("verify_boards_vectorized")
+    values = np.asarray(values)
+    if values.ndim != 2 or values.shape[1] != 81 or not np.issubdtype(values.dtype, np.integer):
+        raise ValueError("Expected an (N, 81) integer array, got shape {}".format(values.shape))
+    unit_masks = np.bitwise_or.reduce(VALUE_BIT[np.clip(values, 0, 10)][:, UNIT_INDEX], axis=2) # (N, 27)
+    is_bad     = unit_masks != ALL_CANDIDATES
+
+    results = [None] * len(values)
+    for row in np.flatnonzero(is_bad.any(axis=1)):
+        unit_idx = int(is_bad[row].argmax())
+        results[row] = unit_conflict(values[row].tolist(), unit_idx, UNIT_CELLS[unit_idx])
+    return results
+
+def verify_boards(boards) -> List[Optional[Conflict]]:
+    '''
+    Check many filled-in 9x9 boards at once, given flat and row by row as an (N, 81)
+    array or a sequence of 81-value sequences. Returns, per board, None for a valid
+    solution or the Conflict first_conflict would report, without printing anything.
+    Vectorized with numpy, one board at a time without.
+    '''
+    if load_numpy():
+        values = np.asarray(boards, dtype=np.int64)
+        return verify_boards_vectorized(values.reshape(0, 81) if values.size == 0 else values)
+    results = []
+    for values in boards:
+        if len(values) != 81:
+            raise ValueError("Expected 81 values per board, got {}".format(len(values)))
+        results.append(first_conflict([list(values[row * 9: row * 9 + 9]) for row in range(9)]))
+    return results
+
+def verify_packed(solutions: List[bytes]) -> List[Optional[Conflict]]:
+    # verify_boards for packed solutions (81 ASCII digits each, see board_to_bytes).
+    for solution in solutions:
+        if len(solution) != 81:
+            raise ValueError("Packed puzzle must be 81 bytes, got {}".format(len(solution)))
+    if not load_numpy():
+        return verify_boards([[0 if ch == 46 else ch - 48 for ch in solution] for solution in solutions])
+    raw = np.frombuffer(b"".join(bytes(solution) for solution in solutions), dtype=np.uint8).reshape(-1, 81)
+    return verify_boards_vectorized(np.where(raw == 46, 0, raw.astype(np.int64) - 48))
+
+def solve_packed(puzzles: List[bytes], engine: str = "sets", techniques: Tuple[str, ...] = ()) -> List[Tuple[bool, str, bytes]]:
+    # Solve a chunk of packed puzzles with solve_packed_puzzle; this is what runs in the
+    # worker processes. The bits engine uses solve_packed_vectorized when numpy is installed.
+    check_solver_options(engine, techniques)
+    if engine == "bits" and len(puzzles) > 1 and load_numpy():
+        return solve_packed_vectorized(puzzles)
+    return [solve_packed_puzzle(puzzle, engine, techniques) for puzzle in puzzles]
+
+def iter_chunks(items: Iterable, chunksize: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_solve_packed(puzzles: Iterable[bytes], workers: Optional[int] = None, chunksize: int = 64,
+                      engine: str = "sets", techniques: Tuple[str, ...] = ()) -> Iterator[Tuple[bool, str, bytes]]:
+    '''
+    Lazily solve packed puzzles over a process pool, yielding solve_packed results in
+    input order. At most two chunks per worker are in flight, so memory stays bounded
+    however long puzzles is. workers=None uses every CPU, workers=1 solves in this
+    process without a pool.
+    '''
+    check_solver_options(engine, techniques)
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in iter_chunks(puzzles, chunksize):
+            yield from solve_packed(chunk, engine, techniques)
+        return
+    yield from iter_pool_results(iter_chunks(puzzles, chunksize), workers,
+                                 lambda executor, chunk: executor.submit(solve_packed, chunk, engine, techniques))
+
+def iter_pool_results(jobs: Iterable, workers: int, submit: Callable) -> Iterator:
+    '''
+    Run jobs over a pool of workers processes, yielding the items of every job's result
+    in job order. submit(executor, job) submits one job and returns its future. At most
+    two jobs per worker are in flight, so only as many jobs are taken from jobs as the
+    workers can keep busy.
+    '''
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for job in jobs:
+                pending.append(submit(executor, job))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Only matters when the caller stops early: drop the jobs not started yet.
+            for future in pending:
+                future.cancel()
+
+def solve_many(boards: Iterable[List[List[int]]], workers: Optional[int] = None, chunksize: int = 64,
+               engine: str = "sets", techniques: Tuple[str, ...] = ()) -> List[Tuple[bool, str, Optional[List[List[int]]]]]:
+    '''
+    Solve many boards in parallel. Returns one (is_solved, msg, solution) per board, in
+    input order, where is_solved and msg follow solve_sudoku and solution is the solved
+    board or None. Unlike solve_sudoku, the input boards are left untouched. A board
+    that is not 9x9 or holds something other than 0-9 is reported as invalid in its
+    place; it does not stop the others.
+    '''
+    def pack(board) -> bytes:
+        # b"" can't be unpacked, so solve_packed_puzzle reports it as invalid.
+        try:
+            if board_shape(board) == 3:
+                return board_to_bytes(board)
+        except (ValueError, TypeError):
+            pass
+        return b""
+
+    packed = (pack(board) for board in boards)
+    return [(is_solved, msg, bytes_to_board(solution) if is_solved else None)
+            for is_solved, msg, solution in iter_solve_packed(packed, workers, chunksize, engine, techniques)]
+
 def limit_to_one_digit(P):
     """Allow only one digit or empty string"""
     if len(P) == 0:
@@ -268,19 +1404,20 @@ def limit_to_one_digit(P):
         # Anything else, reject it
         return False
 
-def spawn(difficulty) -> list: #spawn any 9x9 sudoku board with empty tiles to solve, might spawn an unsolvable board
+def spawn(difficulty, box_size: int = 3) -> list: #spawn any N^2xN^2 sudoku board (9x9 by default) with empty tiles to solve, might spawn an unsolvable board
+    side = box_size * box_size
     def isValid(sud, row, col, value) -> bool: #check if for current row, column, the input value is acceptable according to the rules
-        for i in range(9):
+        for i in range(side):
             if sud[i][col] == value or sud[row][i] == value:
                 return False
-            block_row = 3 * (row // 3) + i//3
-            block_col = 3 * (col // 3) + i%3
+            block_row = box_size * (row // box_size) + i//box_size
+            block_col = box_size * (col // box_size) + i%box_size
             if sud[block_row][block_col] == value:
                 return False
         return True   
     
-    sud = [[0 for _ in range(9)] for _ in range(9)]
-    numb = [1,2,3,4,5,6,7,8,9]
+    sud = [[0 for _ in range(side)] for _ in range(side)]
+    numb = list(range(1, side + 1))
     rate = 0
     if difficulty == "EXPERT":
         rate = 9
@@ -290,16 +1427,59 @@ def spawn(difficulty) -> list: #spawn any 9x9 sudoku board with empty tiles to s
         rate = 21
     elif difficulty == "EASY":
         rate = 30
-    for row in range(9):
-        for col in range(9):
+    for row in range(side):
+        for col in range(side):
             if random.uniform(0,100) < rate:              
                 val = random.choice(numb)
                 counter = 0
-                while counter < 9:
+                while counter < side:
                     if isValid(sud, row, col, val):
                         sud[row][col] = val
                         break
-                    val = ((val + 1) %9) or 9
+                    val = ((val + 1) %side) or side
                     counter +=1  
                 continue                    
-    return sud
\ No newline at end of file
+    return sud
+
+def read_puzzle_lines(stream) -> Iterator[bytes]:
+    # Yield one packed puzzle per non-blank line of a binary stream, without reading ahead.
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Command line solver: python -m sudoku_penciling [file]
+    parser = argparse.ArgumentParser(prog="python -m sudoku_penciling",
+                                     description="Solve sudokus given one per line as 81 characters, "
+                                                 "with 0 or . for blanks. Prints one line per puzzle, in order: "
+                                                 "the solution, or the puzzle as given if it could not be solved.")
+    parser.add_argument("file", nargs="?", help="puzzle file to read instead of stdin")
+    parser.add_argument("--workers", type=int, default=1, help="solver processes, 0 for one per CPU (default: 1)")
+    parser.add_argument("--chunksize", type=int, default=64, help="puzzles sent to a worker at a time (default: 64)")
+    parser.add_argument("--engine", choices=ENGINES, default="sets", help="solver backend (default: sets)")
+    parser.add_argument("--status", action="store_true",
+                        help="append a tab and the status (ok, invalid or unsolvable) to every line")
+    args = parser.parse_args(argv)
+    if args.workers < 0:
+        parser.error("--workers must not be negative")
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+
+    stream = open(args.file, "rb") if args.file else sys.stdin.buffer
+    out = sys.stdout.buffer
+    try:
+        results = iter_solve_packed(read_puzzle_lines(stream), args.workers or None, args.chunksize, args.engine)
+        for is_solved, msg, board in results:
+            out.write(board)
+            if args.status:
+                out.write(b"\t" + (msg or "ok").encode())
+            out.write(b"\n")
+    finally:
+        if args.file:
+            stream.close()
+        out.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
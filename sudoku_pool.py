@@ -0,0 +1,147 @@
+import json
+import os
+import random
+import threading
+from collections import deque
+from typing import List, Optional, Tuple
+import sudoku_penciling as sud
+import sudoku_generator as gen
+
+# Pool of ready-made puzzles per difficulty.
+# Generating a graded puzzle can take a second or two, far too long for a button
+# callback, so PuzzlePool keeps a queue of (puzzle, solution) pairs per difficulty and
+# pop() just takes the oldest one. A background thread tops a queue back up to
+# capacity as soon as it drops below low_water, and the pool can be saved to and
+# loaded from a JSON file so a fresh start doesn't begin empty. When a queue is empty
+# pop() returns None rather than generating on the caller's thread; the refill thread
+# then works on that difficulty next, so the caller can simply try again shortly.
+
+DEFAULT_POOL_PATH = os.path.join(os.path.expanduser("~"), ".sudoku_puzzle_pool.json")
+
+def is_valid_entry(puzzle: bytes, solution: bytes) -> bool:
+    # A saved pair is usable if both parse and the solution is a complete grid.
+    try:
+        sud.bytes_to_board(puzzle)
+        return b"0" not in solution and b"." not in solution and len(sud.bytes_to_board(solution)) == 9
+    except ValueError:
+        return False
+
+class PuzzlePool:
+    def __init__(self, path: Optional[str] = DEFAULT_POOL_PATH, capacity: int = 10, low_water: int = 3,
+                 graded: bool = True, rng: Optional[random.Random] = None):
+        if not 0 <= low_water <= capacity or capacity < 1:
+            raise ValueError("Expected 0 <= low_water <= capacity and capacity >= 1")
+        self.path      = path
+        self.capacity  = capacity
+        self.low_water = low_water
+        self.graded    = graded # generate with grade=difficulty, see generate_puzzle
+        self._rng      = rng or random.Random()
+        # difficulty -> deque of (packed puzzle, packed solution), see board_to_bytes
+        self._pools     = { difficulty: deque() for difficulty in gen.DIFFICULTY_CLUES }
+        self._refilling = set(self._pools)
+        self._waiting   = set() # difficulties pop() found empty, refilled first
+        self._lock   = threading.Lock()
+        self._wake   = threading.Event()
+        self._stop   = threading.Event()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return sum(len(pool) for pool in self._pools.values())
+
+    def size(self, difficulty: str) -> int:
+        return len(self._pools[difficulty])
+
+    def generate(self, difficulty: str) -> Tuple[List[List[int]], List[List[int]]]:
+        return gen.generate_puzzle(difficulty, rng=self._rng, grade=difficulty if self.graded else None)
+
+    def pop(self, difficulty: str, block: bool = False) -> Optional[Tuple[List[List[int]], List[List[int]]]]:
+        '''
+        Return (puzzle, solution) for difficulty, taking a pooled puzzle in O(1). If the
+        pool has run dry, return None (the refill thread, see start(), has it next) or
+        with block set generate one on the spot.
+        '''
+        if difficulty not in self._pools:
+            raise ValueError("Unknown difficulty {}, expected one of {}".format(difficulty, tuple(self._pools)))
+        with self._lock:
+            pool  = self._pools[difficulty]
+            entry = pool.popleft() if pool else None
+            if entry is None:
+                self._waiting.add(difficulty)
+            if len(pool) < self.low_water:
+                self._refilling.add(difficulty)
+                self._wake.set()
+        if entry is None:
+            return self.generate(difficulty) if block else None
+        return sud.bytes_to_board(entry[0]), sud.bytes_to_board(entry[1])
+
+    def push(self, difficulty: str, puzzle: List[List[int]], solution: List[List[int]]) -> None:
+        with self._lock:
+            self._pools[difficulty].append((sud.board_to_bytes(puzzle), sud.board_to_bytes(solution)))
+            self._waiting.discard(difficulty)
+
+    def next_to_refill(self) -> Optional[str]:
+        # The difficulty to refill next, or None if all are full enough. Difficulties that a
+        # pop() is waiting for come first, then the one with the fewest puzzles.
+        with self._lock:
+            for difficulty in list(self._refilling):
+                if len(self._pools[difficulty]) >= self.capacity:
+                    self._refilling.discard(difficulty)
+            if not self._refilling:
+                return None
+            return min(self._refilling, key=lambda difficulty: (difficulty not in self._waiting, len(self._pools[difficulty])))
+
+    def refill_loop(self) -> None:
+        while not self._stop.is_set():
+            difficulty = self.next_to_refill()
+            if difficulty is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            puzzle, solution = self.generate(difficulty)
+            self.push(difficulty, puzzle, solution)
+
+    def start(self) -> None:
+        # Start the background refill thread. It is a daemon thread, so it never keeps the program alive.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.refill_loop, name="sudoku-pool-refill", daemon=True)
+        self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        # Ask the refill thread to stop, waiting up to timeout for the puzzle it is working on.
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def load(self) -> None:
+        # Add the puzzles saved in path. A missing or unreadable file just leaves the pool as it is.
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            entries = { difficulty: [(puzzle.encode(), solution.encode()) for puzzle, solution in saved.get(difficulty, [])]
+                        for difficulty in self._pools }
+        except (OSError, ValueError, TypeError, AttributeError):
+            return
+        for difficulty, pairs in entries.items():
+            entries[difficulty] = [pair for pair in pairs if is_valid_entry(*pair)]
+        with self._lock:
+            for difficulty, pairs in entries.items():
+                pool = self._pools[difficulty]
+                pool.extend(pairs[:max(self.capacity - len(pool), 0)])
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            saved = { difficulty: [[puzzle.decode(), solution.decode()] for puzzle, solution in pool]
+                      for difficulty, pool in self._pools.items() }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(saved, f)
+        os.replace(tmp_path, self.path)
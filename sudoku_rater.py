@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import sudoku_penciling as sud
+
+# Technique-based difficulty rating.
+# A puzzle is as hard as the hardest technique a human needs to solve it, so rate()
+# solves it with a ladder of techniques: at every step it applies the cheapest one
+# that makes progress, then starts again from the bottom. The ladder is naked singles
+# followed by PROPAGATION_TECHNIQUES in TECHNIQUE_COSTS order; when nothing applies
+# the puzzle needs guessing and gets the "guess" cost.
+
+TECHNIQUE_COSTS = {
+    "naked_single":  1,
+    "hidden_single": 2,
+    "naked_pair":    10,
+    "pointing":      12,
+    "box_line":      14,
+    "hidden_pair":   16,
+    "naked_triple":  20,
+    "hidden_triple": 25,
+    "x_wing":        30,
+    "swordfish":     40,
+    "xy_wing":       45,
+    "guess":         100,
+}
+LADDER = tuple(technique for technique in TECHNIQUE_COSTS if technique in sud.PROPAGATION_TECHNIQUES)
+
+# Grade of a puzzle by its score: the cost of its hardest technique.
+GRADES = (
+    (2,   "EASY"),
+    (16,  "MEDIUM"),
+    (30,  "HARD"),
+    (100, "EXPERT"),
+)
+GRADE_ORDER = tuple(grade for max_score, grade in GRADES)
+
+@dataclass
+class Rating:
+    grade:  str  # one of GRADE_ORDER, "invalid" or "unsolvable"
+    score:  int  # cost of the hardest technique used
+    effort: int  # sum of the costs of every step, to tell apart puzzles of the same score
+    histogram: Dict[str, int] = field(default_factory=dict) # technique -> times applied
+    solved_by_logic: bool = True
+
+def grade_for_score(score: int) -> str:
+    for max_score, grade in GRADES:
+        if score <= max_score:
+            return grade
+    return GRADE_ORDER[-1]
+
+def rate(board: List[List[int]]) -> Rating:
+    '''
+    Rate a puzzle. The histogram counts naked singles per cell placed and every other
+    technique per successful application. A board with conflicting clues, or that
+    runs into a contradiction, is graded "invalid" or "unsolvable" respectively.
+    '''
+    try:
+        row_sets, col_sets, box_sets = sud.init_group_sets(board)
+    except Exception as e:
+        return Rating("invalid", 0, 0, {}, False)
+    board_candidates, is_finalized = sud.init_board_candidates(board, row_sets, col_sets, box_sets)
+    state = sud.SolveState(board_candidates, is_finalized)
+
+    histogram = {}
+    placed = sum(1 for row in board for value in row if value != 0)
+    while True:
+        # Naked singles first; winnow without techniques does exactly that.
+        is_valid, return_code = sud.winnow(state)
+        if not is_valid:
+            return Rating("unsolvable", 0, 0, histogram, False)
+        now_placed = sum(row.count(True) for row in state.is_finalized)
+        if now_placed > placed:
+            histogram["naked_single"] = histogram.get("naked_single", 0) + now_placed - placed
+            placed = now_placed
+        if placed == 81:
+            break
+
+        for technique in LADDER:
+            is_valid, made_progress = sud.PROPAGATION_TECHNIQUES[technique](state, [])
+            if not is_valid:
+                return Rating("unsolvable", 0, 0, histogram, False)
+            if made_progress:
+                histogram[technique] = histogram.get(technique, 0) + 1
+                break
+        else:
+            histogram["guess"] = 1
+            break
+
+    score  = max((TECHNIQUE_COSTS[technique] for technique in histogram), default=0)
+    effort = sum(TECHNIQUE_COSTS[technique] * count for technique, count in histogram.items())
+    return Rating(grade_for_score(score), score, effort, histogram, "guess" not in histogram)
+
+def rate_packed(puzzles: List[bytes]) -> List[Rating]:
+    # Rate a chunk of packed puzzles (see board_to_bytes); this runs in the worker processes.
+    ratings = []
+    for puzzle in puzzles:
+        try:
+            board = sud.bytes_to_board(puzzle)
+        except ValueError:
+            ratings.append(Rating("invalid", 0, 0, {}, False))
+            continue
+        ratings.append(rate(board))
+    return ratings
+
+def rate_many(boards: Iterable[List[List[int]]], workers: Optional[int] = None, chunksize: int = 64) -> List[Rating]:
+    # Rate many boards over a process pool, in input order. workers=1 rates in this process.
+    chunks = list(sud.iter_chunks((sud.board_to_bytes(board) for board in boards), chunksize))
+    if workers == 1:
+        return [rating for chunk in chunks for rating in rate_packed(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [rating for ratings in executor.map(rate_packed, chunks) for rating in ratings]
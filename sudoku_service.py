@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import sudoku_penciling as sud
+import sudoku_bench
+import sudoku_hint
+
+# Local solve service.
+# An asyncio server that takes puzzles over a socket, either as a line protocol (send
+# 81-character puzzles one per line, get "<solution or puzzle>\t<status>" back per
+# line, in order; the line STATS returns the service statistics as JSON and the line
+# "HINT <puzzle>" its sudoku_hint.next_hint as JSON) or as plain HTTP (POST /solve or
+# POST /hint with puzzles one per line in the body, GET /stats).
+#
+# Requests are queued and a batcher hands them to the solver processes in batches of
+# up to batch_size, waiting batch_delay seconds for a batch to fill up. Identical
+# puzzles in the queue or being solved at the same time are solved once and every
+# request for them gets the same result. When max_queue puzzles are waiting, new
+# requests wait for room, and a connection stops being read while it has
+# MAX_PIPELINED answers outstanding, so a fast client slows down instead of piling up.
+
+DEFAULT_PORT   = 8765
+MAX_PIPELINED  = 256     # unanswered lines per line protocol connection
+LATENCY_WINDOW = 10000   # requests kept for the latency percentiles
+MAX_HTTP_BODY  = 1 << 20 # bytes of an HTTP request body, about 12000 puzzles
+
+def solve_batch(puzzles: List[bytes], engine: str, max_nodes: Optional[int]) -> List[Tuple[bool, str, bytes]]:
+    # Worker side: solve_packed, or solve_board per puzzle when every solve has a node budget.
+    if max_nodes is None:
+        return sud.solve_packed(puzzles, engine)
+    results = []
+    for puzzle in puzzles:
+        try:
+            board = sud.bytes_to_board(puzzle)
+        except ValueError:
+            results.append((False, "invalid", bytes(puzzle)))
+            continue
+        is_solved, msg = sud.solve_board(board, engine, max_nodes=max_nodes)
+        results.append((is_solved, msg, sud.board_to_bytes(board) if is_solved else bytes(puzzle)))
+    return results
+
+def hint_batch(puzzles: List[bytes]) -> List[Optional[Dict[str, object]]]:
+    # Worker side of hints: next_hint of every puzzle as a JSON-ready dict, None if there is none.
+    hints = []
+    for puzzle in puzzles:
+        try:
+            hint = sudoku_hint.next_hint(sud.bytes_to_board(puzzle))
+        except ValueError as e: # malformed, or sud.InvalidBoard
+            hints.append({ "technique": "invalid", "description": str(e) })
+            continue
+        hints.append(None if hint is None else dict(dataclasses.asdict(hint), description=hint.describe()))
+    return hints
+
+def format_result(result: Tuple[bool, str, bytes]) -> bytes:
+    # Same as the --status output of the command line solver.
+    is_solved, msg, board = result
+    return board + b"\t" + (msg or "ok").encode() + b"\n"
+
+class SolveService:
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 64, batch_delay: float = 0.002,
+                 max_queue: int = 4096, engine: str = "bits", max_nodes: Optional[int] = None):
+        '''
+        workers=None uses every CPU, workers=1 solves in a thread of this process.
+        max_nodes bounds every solve (see SolveBudget); such puzzles come back as "timeout".
+        '''
+        sud.check_solver_options(engine, ())
+        if batch_size < 1 or max_queue < 1:
+            raise ValueError("batch_size and max_queue must be at least 1")
+        self.workers     = workers or os.cpu_count() or 1
+        self.batch_size  = batch_size
+        self.batch_delay = batch_delay
+        self.max_queue   = max_queue
+        self.engine      = engine
+        self.max_nodes   = max_nodes
+        self.requests     = 0
+        self.deduplicated = 0
+        self.batches      = 0
+        self.solving      = 0 # puzzles handed to the workers and not back yet
+        self._inflight  = {} # puzzle -> future of its result, from queueing until solved
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._queue     = None
+        self._executor  = None
+        self._batcher   = None
+        self._batch_tasks = set()
+
+    async def start(self) -> None:
+        if self._batcher is not None:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        # Workers are started as they are needed, with client connections open. Forked
+        # workers would inherit those sockets and keep them open after we close them.
+        self._executor = (ThreadPoolExecutor(1) if self.workers == 1 else
+                          ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn")))
+        # Pay for starting the workers before the first request does.
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, solve_batch, [], self.engine, self.max_nodes)
+                               for _ in range(self.workers)))
+        # Two batches per worker in flight: one being solved, one ready to go.
+        self._batch_slots = asyncio.Semaphore(2 * self.workers)
+        self._batcher = asyncio.ensure_future(self.batch_loop())
+
+    async def close(self) -> None:
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        for task in list(self._batch_tasks):
+            task.cancel()
+        await asyncio.gather(self._batcher, *self._batch_tasks, return_exceptions=True)
+        for future in self._inflight.values():
+            future.cancel()
+        self._inflight.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._batcher = None
+
+    async def solve(self, puzzle: bytes) -> Tuple[bool, str, bytes]:
+        # Solve one packed puzzle, returning what solve_packed_puzzle would.
+        start  = time.perf_counter()
+        puzzle = bytes(puzzle)
+        self.requests += 1
+        future = self._inflight.get(puzzle)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[puzzle] = future
+            try:
+                await self._queue.put(puzzle) # waits while the queue is full
+            except BaseException:
+                # Never queued, so nobody would ever complete it.
+                del self._inflight[puzzle]
+                future.cancel()
+                raise
+        result = await asyncio.shield(future)
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    async def batch_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_delay > 0 and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._batch_slots.acquire()
+            task = asyncio.ensure_future(self.run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def run_batch(self, batch: List[bytes]) -> None:
+        self.solving += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, solve_batch, batch, self.engine, self.max_nodes)
+        except Exception as e:
+            for puzzle in batch:
+                future = self._inflight.pop(puzzle, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        else:
+            for puzzle, result in zip(batch, results):
+                future = self._inflight.pop(puzzle, None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+        finally:
+            self.solving -= len(batch)
+            self.batches += 1
+            self._batch_slots.release()
+
+    async def answer(self, puzzle: bytes) -> bytes:
+        # One line of output for one puzzle; a failed worker is reported like BackgroundSolve does.
+        try:
+            return format_result(await self.solve(puzzle))
+        except Exception:
+            return bytes(puzzle) + b"\terror\n"
+
+    async def hints(self, puzzles: List[bytes]) -> List[Optional[Dict[str, object]]]:
+        # Hints take milliseconds, so they skip the batching and go straight to a worker.
+        return await asyncio.get_running_loop().run_in_executor(self._executor, hint_batch, puzzles)
+
+    def stats(self) -> Dict[str, object]:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth":  self._queue.qsize() if self._queue is not None else 0,
+            "solving":      self.solving,
+            "in_flight":    len(self._inflight),
+            "requests":     self.requests,
+            "deduplicated": self.deduplicated,
+            "batches":      self.batches,
+            "latency_ms": {
+                "p50": 1000 * sudoku_bench.percentile(latencies, 0.50),
+                "p99": 1000 * sudoku_bench.percentile(latencies, 0.99),
+                "max": 1000 * (latencies[-1] if latencies else 0.0),
+            },
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            first_line = await reader.readline()
+            if first_line.startswith((b"GET ", b"POST ")):
+                await self.handle_http(first_line, reader, writer)
+            else:
+                await self.handle_lines(first_line, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError): # ValueError: line over the stream limit
+            pass
+        finally:
+            writer.close()
+
+    async def handle_lines(self, line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Answers are written in request order by a second task, while this one keeps reading.
+        # Queued: a task making an answer, STATS (answered when its turn comes) or None at the end.
+        answers = asyncio.Queue(MAX_PIPELINED)
+
+        async def write_answers() -> None:
+            while True:
+                answer = await answers.get()
+                if answer is None:
+                    return
+                if answer == b"STATS":
+                    writer.write(json.dumps(self.stats()).encode() + b"\n")
+                else:
+                    writer.write(await answer)
+                await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_answers())
+        try:
+            while line:
+                line = line.strip()
+                if line == b"STATS":
+                    await answers.put(line)
+                elif line.startswith(b"HINT "):
+                    await answers.put(asyncio.ensure_future(self.hint_line(line[5:].strip())))
+                elif line:
+                    await answers.put(asyncio.ensure_future(self.answer(line)))
+                line = await reader.readline()
+            await answers.put(None)
+            await writer_task
+        finally:
+            writer_task.cancel()
+
+    async def hint_line(self, puzzle: bytes) -> bytes:
+        hint, = await self.hints([puzzle])
+        return json.dumps(hint).encode() + b"\n"
+
+    async def read_http_request(self, request_line: bytes, reader: asyncio.StreamReader) -> Tuple[str, str, str, bytes]:
+        # (error status or "", method, path, body); a bad request is answered without reading its body.
+        parts = request_line.decode("latin-1").split()
+        content_length = 0
+        while True:
+            try:
+                header = await reader.readline()
+            except ValueError: # longer than the stream's line limit
+                return "400 Bad Request", "", "", b""
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    content_length = int(value.strip())
+                except ValueError:
+                    return "400 Bad Request", "", "", b""
+        if len(parts) < 2 or content_length < 0:
+            return "400 Bad Request", "", "", b""
+        if content_length > MAX_HTTP_BODY:
+            return "413 Payload Too Large", "", "", b""
+        body = await reader.readexactly(content_length) if content_length else b""
+        return "", parts[0], parts[1], body
+
+    async def handle_http(self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        error, method, path, body = await self.read_http_request(request_line, reader)
+
+        status, content_type = "200 OK", "text/plain"
+        if error:
+            status, content = error, error.split(" ", 1)[1].encode() + b"\n"
+        elif method == "GET" and path == "/stats":
+            content, content_type = json.dumps(self.stats()).encode(), "application/json"
+        elif method == "POST" and path == "/solve":
+            puzzles = [line.strip() for line in body.splitlines() if line.strip()]
+            content = b"".join(await asyncio.gather(*(self.answer(puzzle) for puzzle in puzzles)))
+        elif method == "POST" and path == "/hint":
+            puzzles = [line.strip() for line in body.splitlines() if line.strip()]
+            content, content_type = json.dumps(await self.hints(puzzles)).encode(), "application/json"
+        else:
+            status, content = "404 Not Found", b"Not found\n"
+        writer.write("HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                     .format(status, content_type, len(content)).encode("latin-1") + content)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        # Start the service and listen on host:port (port 0 picks a free one).
+        await self.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+async def run_service(service: SolveService, host: str, port: int) -> None:
+    server = await service.serve(host, port)
+    for sock in server.sockets:
+        print("Listening on {}:{}".format(*sock.getsockname()[:2]), flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve sudoku solving on a local socket, "
+                                                 "as a line protocol or as HTTP (POST /solve, POST /hint, GET /stats).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=0, help="solver processes, 0 for one per CPU (default: 0)")
+    parser.add_argument("--batch-size", type=int, default=64, help="puzzles per batch (default: 64)")
+    parser.add_argument("--batch-delay", type=float, default=0.002, help="seconds to wait for a batch to fill (default: 0.002)")
+    parser.add_argument("--max-queue", type=int, default=4096, help="queued puzzles before requests wait (default: 4096)")
+    parser.add_argument("--engine", choices=sud.ENGINES, default="bits", help="solver backend (default: bits)")
+    parser.add_argument("--max-nodes", type=int, help="give up on a puzzle after this many search nodes")
+    args = parser.parse_args(argv)
+
+    service = SolveService(args.workers or None, args.batch_size, args.batch_delay, args.max_queue,
+                           args.engine, args.max_nodes)
+    try:
+        asyncio.run(run_service(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
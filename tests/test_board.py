@@ -0,0 +1,45 @@
+import sudoku_penciling as sud
+import sudoku_board
+
+PUZZLE = "400000805030000000000700000020000060000080400000010000000603070500200000104000000"
+
+def count_searches(monkeypatch):
+    calls = []
+    solve_bits = sud.solve_bits
+    def counting_solve_bits(state, budget=None):
+        calls.append(state)
+        return solve_bits(state, budget)
+    monkeypatch.setattr(sud, "solve_bits", counting_solve_bits)
+    return calls
+
+def test_unsolvable_verdict_is_kept_until_a_cell_is_cleared(monkeypatch):
+    board    = sud.bytes_to_board(PUZZLE.encode())
+    solution = sud.bytes_to_board(PUZZLE.encode())
+    assert sud.solve_board(solution, "bits") == (True, "")
+    model = sudoku_board.BoardModel(board)
+    model.set(0, 1, 9) # (1, 6) has to be 9, so nothing can follow
+    calls = count_searches(monkeypatch)
+    assert model.is_solvable() is False
+    assert len(calls) == 1
+
+    # Adding values cannot make it solvable again, so no search runs.
+    model.set(8, 8, solution[8][8])
+    assert model.is_solvable() is False
+    assert len(calls) == 1
+
+    model.set(0, 1, 0)
+    assert model.is_solvable() is True
+    assert len(calls) == 2
+
+def test_remembered_verdicts_need_no_search(monkeypatch):
+    board    = sud.bytes_to_board(PUZZLE.encode())
+    solution = sud.bytes_to_board(PUZZLE.encode())
+    assert sud.solve_board(solution, "bits") == (True, "")
+    model = sudoku_board.BoardModel(board)
+    model.remember_solution(solution)
+    calls = count_searches(monkeypatch)
+    assert model.is_solvable(0) is True
+    model.set(0, 1, 9)
+    model.remember_unsolvable()
+    assert model.is_solvable(0) is False
+    assert calls == []
@@ -0,0 +1,57 @@
+import random
+import sudoku_cache
+import sudoku_penciling as sud
+
+PUZZLES = [
+    "530070000600195000098000060800060003400803001700020006060000280000419005000080079",
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+]
+
+def random_variant(board, rng):
+    grid   = sudoku_cache.transpose(board) if rng.random() < 0.5 else board
+    rows   = [band * 3 + row for band in rng.sample(range(3), 3) for row in rng.sample(range(3), 3)]
+    cols   = [stack * 3 + col for stack in rng.sample(range(3), 3) for col in rng.sample(range(3), 3)]
+    labels = [0] + rng.sample(range(1, 10), 9)
+    return [[labels[grid[row][col]] for col in cols] for row in rows]
+
+def test_symmetry_variants_share_one_key():
+    rng = random.Random(7)
+    for puzzle in PUZZLES:
+        board = sud.bytes_to_board(puzzle.encode())
+        keys = {sudoku_cache.canonicalize(random_variant(board, rng))[0] for _ in range(20)}
+        assert len(keys) == 1, puzzle
+
+def test_transform_maps_board_to_key():
+    board = sud.bytes_to_board(PUZZLES[0].encode())
+    key, transform = sudoku_cache.canonicalize(board)
+    assert sud.board_to_bytes(transform.apply(board)) == key
+    assert transform.invert(transform.apply(board)) == board
+
+def test_variants_are_solved_once():
+    rng   = random.Random(11)
+    cache = sudoku_cache.SolutionCache()
+    for puzzle in PUZZLES:
+        board = sud.bytes_to_board(puzzle.encode())
+        for _ in range(5):
+            variant = random_variant(board, rng)
+            clues   = [row[:] for row in variant]
+            assert cache.solve(variant) == (True, "")
+            assert all(clues[row][col] in (0, variant[row][col]) for row, col in sud.CELL_COORDS)
+    assert (cache.misses, cache.hits) == (len(PUZZLES), 4 * len(PUZZLES))
+
+def test_near_empty_board_is_solved_without_key():
+    cache = sudoku_cache.SolutionCache()
+    board = [[0] * 9 for _ in range(9)]
+    assert sudoku_cache.canonicalize(board) is None
+    assert cache.solve(board) == (True, "")
+    assert len(cache) == 0
+
+def test_boards_that_are_not_9x9_bypass_the_cache():
+    cache = sudoku_cache.SolutionCache()
+    board = [[0] * 16 for _ in range(16)]
+    assert cache.solve(board) == (True, "")
+    assert sud.first_conflict(board) is None
+    assert cache.solve([[0] * 8 for _ in range(8)]) == (False, "invalid")
+    assert cache.solve([[0] * 9 for _ in range(8)]) == (False, "invalid")
+    assert len(cache) == 0 and cache.misses == 0
@@ -0,0 +1,64 @@
+import pytest
+import sudoku_penciling as sud
+
+PUZZLE = "530070000600195000098000060800060003400803001700020006060000280000419005000080079"
+
+def puzzle_board(puzzle=PUZZLE):
+    return sud.bytes_to_board(puzzle.encode())
+
+@pytest.mark.parametrize("clue", [10, -1])
+def test_out_of_range_clue_is_invalid_on_every_engine(clue):
+    for engine in sud.ENGINES:
+        board = puzzle_board()
+        board[0][2] = clue
+        original = [row[:] for row in board]
+        assert sud.solve_board(board, engine) == (False, "invalid"), engine
+        assert board == original, engine
+
+def test_out_of_range_clue_is_reported():
+    board = puzzle_board()
+    board[4][4] = 12
+    with pytest.raises(sud.InvalidBoard) as excinfo:
+        sud.init_group_sets(board)
+    assert [(conflict.reason, conflict.value, conflict.cells) for conflict in excinfo.value.conflicts] == \
+           [("out_of_range", 12, ((4, 4),))]
+
+@pytest.mark.parametrize("engine", sud.COUNT_ENGINES)
+@pytest.mark.parametrize("clue", [10, -1])
+def test_count_solutions_of_out_of_range_clue_is_zero(engine, clue):
+    board = puzzle_board()
+    board[0][2] = clue
+    assert sud.count_solutions(board, engine=engine) == 0
+
+@pytest.mark.parametrize("engine", sud.COUNT_ENGINES)
+def test_count_solutions_stops_at_limit(engine):
+    assert sud.count_solutions(puzzle_board(), engine=engine) == 1
+    assert sud.count_solutions(puzzle_board("0" * 81), 3, engine) == 3
+
+def test_other_sizes_are_solved_whole():
+    for engine in sud.ENGINES:
+        board = [[0] * 16 for _ in range(16)]
+        assert sud.solve_board(board, engine) == (True, ""), engine
+        assert sud.verify_sudoku(board), engine
+
+def test_other_sizes_are_counted_whole():
+    board = [[0] * 16 for _ in range(16)]
+    assert sud.solve_board(board, "bits") == (True, "")
+    board[0][0] = 0
+    for engine in sud.COUNT_ENGINES:
+        assert sud.count_solutions(board, engine=engine) == 1, engine
+
+def test_boards_of_no_sudoku_shape_are_invalid():
+    for board in ([[0] * 8 for _ in range(8)], [[0] * 9 for _ in range(8)], []):
+        for engine in sud.ENGINES:
+            assert sud.solve_board([row[:] for row in board], engine) == (False, "invalid"), engine
+        assert sud.count_solutions(board) == 0
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_many_reports_malformed_boards_in_place(workers):
+    out_of_range = puzzle_board()
+    out_of_range[0][2] = 300
+    boards  = [puzzle_board(), [[0] * 8 for _ in range(8)], out_of_range, puzzle_board()]
+    results = sud.solve_many(boards, workers=workers, chunksize=2)
+    assert [result[:2] for result in results] == [(True, ""), (False, "invalid"), (False, "invalid"), (True, "")]
+    assert results[1][2] is None and results[0][2] == results[3][2]
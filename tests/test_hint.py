@@ -0,0 +1,36 @@
+import sudoku_penciling as sud
+import sudoku_hint
+
+# Its hints need pointing before the fourth placement shows.
+PUZZLE = "400000805030000000000700000020000060000080400000010000000603070500200000104000000"
+
+def test_hints_always_place_a_value():
+    board    = sud.bytes_to_board(PUZZLE.encode())
+    solution = sud.bytes_to_board(PUZZLE.encode())
+    assert sud.solve_board(solution, "bits") == (True, "")
+    techniques = set()
+    for placed in range(20):
+        hint = sudoku_hint.next_hint(board)
+        assert hint.technique in ("naked_single", "hidden_single")
+        (row, col), = hint.cells
+        assert board[row][col] == 0 and solution[row][col] == hint.value
+        for step in hint.steps:
+            techniques.add(step.technique)
+            assert all(solution[r][c] != value for r, c, value in step.eliminations)
+        board[row][col] = hint.value
+    assert "pointing" in techniques
+
+def test_wrong_entry_gives_a_contradiction():
+    board = sud.bytes_to_board(PUZZLE.encode())
+    board[0][1] = 9 # (1, 6) has to be 9
+    hint = sudoku_hint.next_hint(board)
+    while hint.technique != "contradiction":
+        (row, col), = hint.cells
+        board[row][col] = hint.value
+        hint = sudoku_hint.next_hint(board)
+    assert hint.technique == "contradiction"
+
+def test_full_board_has_no_hint():
+    board = sud.bytes_to_board(PUZZLE.encode())
+    assert sud.solve_board(board, "bits") == (True, "")
+    assert sudoku_hint.next_hint(board) is None
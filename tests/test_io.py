@@ -0,0 +1,72 @@
+import io
+import random
+import pytest
+import sudoku_io
+
+def random_records(count, rng):
+    # (puzzle, solution or None); any digits will do, the format doesn't check the rules.
+    records = []
+    for _ in range(count):
+        puzzle   = bytes(rng.choice(b"0123456789") for _ in range(81))
+        solution = bytes(rng.choice(b"123456789") for _ in range(81)) if rng.random() < 0.5 else None
+        records.append((puzzle, solution))
+    return records
+
+@pytest.fixture
+def packed_path(tmp_path):
+    # More than two index blocks, so lookups walk from every block.
+    records = random_records(2 * sudoku_io.INDEX_STRIDE + 17, random.Random(3))
+    path = str(tmp_path / "puzzles.sdkp")
+    with sudoku_io.PackedPuzzleWriter(path) as writer:
+        for puzzle, solution in records:
+            writer.write(puzzle, solution)
+    return path, records
+
+def test_packed_file_round_trip(packed_path):
+    path, records = packed_path
+    assert sudoku_io.is_packed_file(path)
+    with sudoku_io.PackedPuzzleFile(path) as packed_file:
+        assert len(packed_file) == len(records)
+        assert list(packed_file.iter_records(0, len(records))) == records
+        assert list(packed_file) == [puzzle for puzzle, _ in records]
+
+        offsets = [packed_file.record_offset(idx) for idx in range(len(records))]
+        assert offsets[0] == sudoku_io.PACKED_HEADER.size
+        for idx, (puzzle, solution) in enumerate(records[:-1]):
+            assert offsets[idx + 1] - offsets[idx] == sudoku_io.PACKED_SIZE * (1 if solution is None else 2)
+
+        rng = random.Random(5)
+        for idx in rng.sample(range(len(records)), 40):
+            puzzle, solution = records[idx]
+            assert packed_file[idx] == puzzle
+            assert packed_file.solution(idx) == solution
+            assert list(packed_file.iter_records(idx, idx + 10)) == records[idx:idx + 10]
+        assert packed_file[-1] == records[-1][0]
+        with pytest.raises(IndexError):
+            packed_file[len(records)]
+
+def test_packed_stream_round_trip(packed_path):
+    path, records = packed_path
+    with open(path, "rb") as stream:
+        assert list(sudoku_io.iter_packed_stream(stream)) == records
+
+def test_blanks_unpack_as_zeros(tmp_path):
+    path = str(tmp_path / "dots.sdkp")
+    with sudoku_io.PackedPuzzleWriter(path) as writer:
+        writer.write(b"." * 80 + b"5")
+    with sudoku_io.PackedPuzzleFile(path) as packed_file:
+        assert packed_file[0] == b"0" * 80 + b"5" and packed_file.solution(0) is None
+
+def test_truncated_file_is_rejected(packed_path):
+    path, records = packed_path
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        sudoku_io.PackedPuzzleFile(path)
+
+    # Read front to back, the records themselves run out.
+    cut = sudoku_io.PACKED_HEADER.size + sudoku_io.PACKED_SIZE * len(records) // 2
+    with pytest.raises(ValueError, match="truncated"):
+        list(sudoku_io.iter_packed_stream(io.BytesIO(data[:cut])))
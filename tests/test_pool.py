@@ -0,0 +1,30 @@
+import time
+import sudoku_pool
+
+def test_pop_on_empty_pool_does_not_generate(monkeypatch):
+    pool = sudoku_pool.PuzzlePool(path=None)
+    calls = []
+    monkeypatch.setattr(pool, "generate", lambda difficulty: calls.append(difficulty))
+    started = time.perf_counter()
+    assert pool.pop("HARD") is None
+    assert time.perf_counter() - started < 0.1
+    assert calls == []
+    assert pool.next_to_refill() == "HARD"
+
+def test_pop_blocking_generates_on_the_spot():
+    pool = sudoku_pool.PuzzlePool(path=None, graded=False)
+    puzzle, solution = pool.pop("EASY", block=True)
+    assert all(puzzle[row][col] in (0, solution[row][col]) for row in range(9) for col in range(9))
+
+def test_refill_thread_serves_an_empty_pool():
+    pool = sudoku_pool.PuzzlePool(path=None, capacity=1, low_water=1, graded=False)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 30
+        entry = pool.pop("EASY")
+        while entry is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = pool.pop("EASY")
+        assert entry is not None
+    finally:
+        pool.stop()
@@ -0,0 +1,33 @@
+import asyncio
+import sudoku_service
+
+PUZZLE = b"530070000600195000098000060800060003400803001700020006060000280000419005000080079"
+
+async def http_status(request: bytes) -> bytes:
+    service = sudoku_service.SolveService(workers=1)
+    server  = await service.serve("127.0.0.1", 0)
+    try:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.split(b"\r\n", 1)[0]
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.close()
+
+def test_http_solve():
+    request = b"POST /solve HTTP/1.1\r\nContent-Length: 82\r\n\r\n" + PUZZLE + b"\n"
+    assert asyncio.run(http_status(request)) == b"HTTP/1.1 200 OK"
+
+def test_http_malformed_requests_get_400():
+    for request in (b"GET \r\n\r\n",
+                    b"POST /solve HTTP/1.1\r\nContent-Length: lots\r\n\r\n",
+                    b"POST /solve HTTP/1.1\r\nContent-Length: -5\r\n\r\n"):
+        assert asyncio.run(http_status(request)) == b"HTTP/1.1 400 Bad Request", request
+
+def test_http_body_size_is_limited():
+    request = "POST /solve HTTP/1.1\r\nContent-Length: {}\r\n\r\n".format(sudoku_service.MAX_HTTP_BODY + 1).encode()
+    assert asyncio.run(http_status(request)) == b"HTTP/1.1 413 Payload Too Large"
@@ -0,0 +1,27 @@
+import sudoku_penciling as sud
+
+# Needs guesses on naked singles alone, but hidden singles and the rest get it further.
+HARD = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+
+def solve_with_stats(techniques):
+    board = sud.bytes_to_board(HARD.encode())
+    stats = sud.SolveStats()
+    assert sud.solve_board(board, "sets", techniques, stats=stats) == (True, "")
+    assert sud.verify_sudoku(board)
+    return stats
+
+def test_guesses_avoided_needs_techniques():
+    assert solve_with_stats(()).guesses_avoided == 0
+
+def test_guesses_avoided_counts_every_branch():
+    stats = solve_with_stats(sud.ALL_TECHNIQUES)
+    assert stats.guesses_avoided > 0
+    assert stats.as_dict()["guesses_avoided"] == stats.guesses_avoided
+
+    # The solved state only carries the count along its own path.
+    board = sud.bytes_to_board(HARD.encode())
+    row_sets, col_sets, box_sets = sud.init_group_sets(board)
+    state = sud.SolveState(*sud.init_board_candidates(board, row_sets, col_sets, box_sets), sud.ALL_TECHNIQUES)
+    solved_state = sud.solve(state)
+    assert stats.backtracks > 0
+    assert stats.guesses_avoided > solved_state.guesses_avoided
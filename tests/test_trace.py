@@ -0,0 +1,42 @@
+import sudoku_penciling as sud
+
+# Needs guessing and backtracking on the bits engine.
+PUZZLE = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+
+def test_replaying_the_trace_gives_the_solution():
+    board    = sud.bytes_to_board(PUZZLE.encode())
+    solution = sud.bytes_to_board(PUZZLE.encode())
+    assert sud.solve_board(solution, "bits") == (True, "")
+
+    shown = { (row, col): board[row][col] for row, col in sud.CELL_COORDS if board[row][col] }
+    kinds = set()
+    trace = sud.trace_solve(board)
+    while True:
+        try:
+            event = next(trace)
+        except StopIteration as stop:
+            cells = stop.value
+            break
+        kinds.add(event.kind)
+        if event.kind == "finalize":
+            assert (event.row, event.col) not in shown
+            shown[(event.row, event.col)] = event.value
+        elif event.kind == "backtrack":
+            assert (event.row, event.col) in event.undone
+            for cell in event.undone:
+                del shown[cell]
+    assert kinds == set(sud.TRACE_EVENTS)
+    assert shown == { (row, col): solution[row][col] for row, col in sud.CELL_COORDS }
+    assert [sud.LOWEST_VALUE[cur_mask & sud.ALL_CANDIDATES] for cur_mask in cells] == sum(solution, [])
+
+def test_trace_of_unsolvable_board_returns_none():
+    # A wrong value that conflicts with no clue; the puzzle has only one solution.
+    board = sud.bytes_to_board(PUZZLE.encode())
+    board[0][1] = 2 # the solution has 1 here
+    assert sud.count_solutions(board) == 0
+    trace = sud.trace_solve(board)
+    try:
+        while True:
+            next(trace)
+    except StopIteration as stop:
+        assert stop.value is None
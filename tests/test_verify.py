@@ -0,0 +1,29 @@
+import sudoku_penciling as sud
+
+SOLUTION = "534678912672195348198342567859761423426853791713924856961537284287419635345286179"
+
+def solved_board():
+    return sud.bytes_to_board(SOLUTION.encode())
+
+def test_valid_board_prints_nothing(capsys):
+    assert sud.verify_sudoku(solved_board())
+    assert capsys.readouterr().out == ""
+
+def test_incomplete_board(capsys):
+    board = solved_board()
+    board[3][3] = 0
+    assert not sud.verify_sudoku(board)
+    assert capsys.readouterr().out == "Incomplete board\n"
+
+def test_out_of_range_names_the_rule_too(capsys):
+    board = solved_board()
+    board[0][0] = 12
+    assert not sud.verify_sudoku(board)
+    assert capsys.readouterr().out == "Input number out of range 1-9\nRule 1 not satisfied\n"
+
+def test_duplicate_in_column(capsys):
+    board = solved_board()
+    # Swapping two cells of a row keeps the row valid but breaks both columns.
+    board[0][0], board[0][1] = board[0][1], board[0][0]
+    assert not sud.verify_sudoku(board)
+    assert capsys.readouterr().out == "Rule 2 not satisfied\n"